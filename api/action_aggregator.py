@@ -0,0 +1,106 @@
+import os
+import numpy as np
+
+# "mean" averages the per-frame softmax probabilities; "log" sums log-probabilities,
+# so frames that are confident against a class count more
+ACTION_AGGREGATION = os.getenv("ACTION_AGGREGATION", "mean").lower()
+# Stop classifying once the leader's margin over the runner-up is this many standard errors above zero
+ACTION_EARLY_EXIT_Z = float(os.getenv("ACTION_EARLY_EXIT_Z", "3.0"))
+# Never stop before this many frames have been classified; 0 disables early exit
+ACTION_EARLY_EXIT_MIN_FRAMES = int(os.getenv("ACTION_EARLY_EXIT_MIN_FRAMES", "16"))
+# Frames arrive in video order, so at least this share of the planned samples must be seen
+# before stopping; otherwise the opening shot alone could decide a long video
+ACTION_EARLY_EXIT_MIN_PROGRESS = float(os.getenv("ACTION_EARLY_EXIT_MIN_PROGRESS", "0.25"))
+ACTION_TOP_K = int(os.getenv("ACTION_TOP_K", "3"))
+
+AGGREGATIONS = ("mean", "log")
+_LOG_FLOOR = 1e-8
+
+class ActionAggregator:
+    """Combines per-frame class probabilities into a ranking of actions, batch by batch.
+
+    add() takes a (frames, classes) probability batch. Frames can carry weights, e.g.
+    the number of sampled frames a keyframe stands for; weights are passed at the time
+    of the question because a keyframe's weight can still grow after it was classified.
+    """
+
+    def __init__(self, class_names, aggregation=ACTION_AGGREGATION, z=ACTION_EARLY_EXIT_Z,
+                 min_frames=ACTION_EARLY_EXIT_MIN_FRAMES, min_progress=ACTION_EARLY_EXIT_MIN_PROGRESS):
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation {aggregation!r}, expected one of {AGGREGATIONS}")
+        self.class_names = list(class_names)
+        self.aggregation = aggregation
+        self.z = z
+        self.min_frames = min_frames
+        self.min_progress = min_progress
+        self._batches = []
+        self._scores = None  # (frames, classes) per-frame evidence, concatenated lazily
+
+    @property
+    def frame_count(self):
+        return self.scores().shape[0]
+
+    def add(self, probs):
+        probs = np.asarray(probs, dtype=np.float64)
+        if self.aggregation == "log":
+            probs = np.log(np.maximum(probs, _LOG_FLOOR))
+        self._batches.append(probs)
+        self._scores = None
+
+    def scores(self):
+        if self._scores is None:
+            self._scores = (np.concatenate(self._batches) if self._batches
+                            else np.zeros((0, len(self.class_names))))
+            self._batches = [self._scores]
+        return self._scores
+
+    def _weights(self, weights):
+        n = self.frame_count
+        if weights is None:
+            return np.ones(n)
+        return np.asarray(weights[:n], dtype=np.float64)
+
+    def totals(self, weights=None):
+        """Weighted mean evidence per class."""
+        scores = self.scores()
+        w = self._weights(weights)
+        return w @ scores / w.sum()
+
+    def decided(self, weights=None, progress=1.0):
+        """True once more frames are very unlikely to change the leading class.
+
+        The per-frame margin of the leader over the runner-up is treated as a sample;
+        the leader is decided when the lower bound mean - z * standard error is above
+        zero. Frames are the independent observations here, not their weights.
+        progress is the share of the planned samples seen so far.
+        """
+        n = self.frame_count
+        if self.min_frames <= 0 or n < max(self.min_frames, 2) or progress < self.min_progress:
+            return False
+        scores = self.scores()
+        w = self._weights(weights)
+        runner_up, leader = np.argsort(w @ scores)[-2:]
+        margins = scores[:, leader] - scores[:, runner_up]
+        mean = np.average(margins, weights=w)
+        variance = np.average((margins - mean) ** 2, weights=w)
+        return mean - self.z * np.sqrt(variance / n) > 0
+
+    def top_actions(self, k=ACTION_TOP_K, weights=None):
+        """The k best actions as [{"action", "confidence"}], confidences summing to at most 1.
+
+        For "mean" the confidence is the mean probability; for "log" it is the
+        normalized geometric mean of the probabilities.
+        """
+        if self.frame_count == 0:
+            return []
+        totals = self.totals(weights)
+        if self.aggregation == "log":
+            totals = np.exp(totals - totals.max())
+            totals = totals / totals.sum()
+        order = np.argsort(totals)[::-1][:k]
+        return [{"action": self.class_names[i], "confidence": round(float(totals[i]), 4)} for i in order]
+
+    def predicted_action(self, weights=None):
+        if self.frame_count == 0:
+            return None
+        return self.class_names[int(np.argmax(self.totals(weights)))]
@@ -1,16 +1,14 @@
 from fastapi import APIRouter, Header, Depends
 from pydantic import BaseModel
 from typing import List, Optional
-import openai
-import os
-import json
+import logging
 from clerk_auth import get_current_user_id
+from llm_gateway import chat_completion, chat_completion_stream
+from json_stream import JSONArrayStream, parse_json_array
+from sse import sse_event, sse_response
 
 router = APIRouter()
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai.api_key = OPENAI_API_KEY
-
 class NewsIdea(BaseModel):
     title: str
     description: str
@@ -21,41 +19,78 @@ class AIRequest(BaseModel):
 class AIResponse(BaseModel):
     reply: List[NewsIdea]
 
+FALLBACK_REPLY = [
+    {"title": "Could not fetch ideas", "description": "Sorry, something went wrong with the AI."}
+]
+
+def build_prompt(question):
+    return (
+        f"Give me 3 clickbait news ideas for: '{question}'. "
+        "Respond ONLY as a JSON array of objects, each with 'title' and 'description' fields. "
+        "Example: [{\"title\": \"Shocking AI Discovery!\", \"description\": \"Scientists reveal a new AI that writes clickbait.\"}]"
+    )
+
+def is_idea(item):
+    return isinstance(item, dict) and bool(item.get("title"))
+
+def parse_ideas(content):
+    """The ideas in a reply, or None when it is not a JSON array starting with an idea."""
+    reply = parse_json_array(content)
+    if not reply or not is_idea(reply[0]):
+        return None
+    return reply
+
+def has_ideas(content):
+    # Only replies that parse are cached, so a malformed one is not served for LLM_CACHE_TTL
+    return parse_ideas(content) is not None
+
+async def stream_ideas(prompt, user_id):
+    """SSE events: one 'idea' per idea as soon as its JSON object is complete, then 'done'."""
+    parser = JSONArrayStream()
+    sent = 0
+    try:
+        async for delta in chat_completion_stream(
+            [{"role": "user", "content": prompt}],
+            max_tokens=400,
+            temperature=0.8,
+            user_id=user_id,
+            purpose="ai_news",
+            cache=True,
+            validate=has_ideas,
+        ):
+            for item in parser.feed(delta):
+                if is_idea(item):
+                    sent += 1
+                    yield sse_event("idea", item)
+    except Exception as e:
+        logging.error(f"Streaming AI news failed: {e}")
+    if not sent:
+        for item in FALLBACK_REPLY:
+            yield sse_event("idea", item)
+    yield sse_event("done", {"count": sent})
+
 @router.post("/ai-news", response_model=AIResponse)
 async def ai_news(
     req: AIRequest,
     user_id: str = Depends(get_current_user_id),
-    authorization: Optional[str] = Header(None)
+    authorization: Optional[str] = Header(None),
+    stream: bool = False
 ):
+    prompt = build_prompt(req.question)
+    if stream:
+        # text/event-stream: the first idea is sent while gpt-4o is still writing the others
+        return sse_response(stream_ideas(prompt, user_id))
     try:
-        prompt = (
-            f"Give me 3 clickbait news ideas for: '{req.question}'. "
-            "Respond ONLY as a JSON array of objects, each with 'title' and 'description' fields. "
-            "Example: [{\"title\": \"Shocking AI Discovery!\", \"description\": \"Scientists reveal a new AI that writes clickbait.\"}]"
-        )
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
+        # Identical questions within the cache TTL reuse the same ideas instead of a new gpt-4o call
+        content = await chat_completion(
+            [{"role": "user", "content": prompt}],
             max_tokens=400,
             temperature=0.8,
+            user_id=user_id,
+            purpose="ai_news",
+            cache=True,
+            validate=has_ideas,
         )
-        content = response.choices[0].message.content.strip()
-        try:
-            start = content.find('[')
-            end = content.rfind(']')
-            if start != -1 and end != -1:
-                json_str = content[start:end+1]
-                reply = json.loads(json_str)
-            else:
-                reply = []
-            if not isinstance(reply, list) or not reply or not reply[0].get("title"):
-                raise Exception("Bad format")
-        except Exception:
-            reply = [
-                {"title": "Could not fetch ideas", "description": "Sorry, something went wrong with the AI."}
-            ]
-        return {"reply": reply}
+        return {"reply": parse_ideas(content) or FALLBACK_REPLY}
     except Exception:
-        return {"reply": [
-            {"title": "Could not fetch ideas", "description": "Sorry, something went wrong with the AI."}
-        ]}
\ No newline at end of file
+        return {"reply": FALLBACK_REPLY}
\ No newline at end of file
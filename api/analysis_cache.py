@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import time
+from fastapi import APIRouter
+
+from analyze_db import DB_PATH
+from db import transaction, run_db
+
+# Lives next to analysis.sqlite3 unless overridden
+CACHE_DB_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(os.path.dirname(DB_PATH), "analysis_cache.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000"))
+
+# Stages whose results are cached per uploaded video
+STAGES = ("visual", "transcription", "music", "video_length")
+
+router = APIRouter()
+
+_counter_lock = threading.Lock()
+_hits = {stage: 0 for stage in STAGES}
+_misses = {stage: 0 for stage in STAGES}
+_evictions = 0
+
+def init_cache():
+    with transaction(CACHE_DB_PATH) as c:
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS stage_cache (
+            video_hash TEXT PRIMARY KEY,
+            frame_params TEXT,
+            predicted_action TEXT,
+            frame_count INTEGER,
+            transcription TEXT,
+            music_info TEXT,
+            video_length REAL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_stage_cache_last_used ON stage_cache (last_used)")
+        # Caches created before top actions were reported lack the column
+        columns = [row[1] for row in c.execute("PRAGMA table_info(stage_cache)").fetchall()]
+        if "top_actions" not in columns:
+            c.execute("ALTER TABLE stage_cache ADD COLUMN top_actions TEXT")
+        # Visual result fields beyond the action (sampled_frames, stopped_early, keyframes) as JSON
+        if "visual_details" not in columns:
+            c.execute("ALTER TABLE stage_cache ADD COLUMN visual_details TEXT")
+
+# Stored in visual_details so a cached visual result has the same fields as a computed one
+VISUAL_DETAILS = ("sampled_frames", "stopped_early", "keyframes")
+
+def get_cached_stages(video_hash, frame_params):
+    """Return the cached stage results for a video as a dict with only the stages present.
+
+    The visual result is only reused when it was computed with the same frame sampling
+    (and stored with its visual_details; older entries are computed again).
+    """
+    with transaction(CACHE_DB_PATH) as c:
+        c.execute(
+            "SELECT frame_params, predicted_action, frame_count, transcription, music_info, video_length, top_actions, "
+            "visual_details FROM stage_cache WHERE video_hash = ?",
+            (video_hash,)
+        )
+        row = c.fetchone()
+        if row:
+            c.execute("UPDATE stage_cache SET last_used = ? WHERE video_hash = ?", (time.time(), video_hash))
+
+    cached = {}
+    if row:
+        if row[1] is not None and row[0] == frame_params and row[7] is not None:
+            cached["visual"] = {"predicted_action": row[1], "frame_count": row[2],
+                                "top_actions": json.loads(row[6]) if row[6] else [], **json.loads(row[7])}
+        if row[3] is not None:
+            cached["transcription"] = row[3]
+        if row[4] is not None:
+            cached["music"] = json.loads(row[4])
+        if row[5] is not None:
+            cached["video_length"] = row[5]
+
+    with _counter_lock:
+        for stage in STAGES:
+            if stage in cached:
+                _hits[stage] += 1
+            else:
+                _misses[stage] += 1
+    return cached
+
+def save_stages(video_hash, frame_params, stages):
+    """Store newly computed stage results, keeping whatever was cached before for the other stages."""
+    global _evictions
+    if not stages:
+        return
+    visual = stages.get("visual")
+    music = stages.get("music")
+    now = time.time()
+    with transaction(CACHE_DB_PATH) as c:
+        c.execute(
+            "INSERT OR IGNORE INTO stage_cache (video_hash, created_at, last_used) VALUES (?, ?, ?)",
+            (video_hash, now, now)
+        )
+        if visual is not None:
+            c.execute(
+                "UPDATE stage_cache SET frame_params = ?, predicted_action = ?, frame_count = ?, top_actions = ?, "
+                "visual_details = ? WHERE video_hash = ?",
+                (frame_params, visual["predicted_action"], visual["frame_count"],
+                 json.dumps(visual.get("top_actions", [])),
+                 json.dumps({key: visual[key] for key in VISUAL_DETAILS if key in visual}), video_hash)
+            )
+        if "transcription" in stages:
+            c.execute("UPDATE stage_cache SET transcription = ? WHERE video_hash = ?", (stages["transcription"], video_hash))
+        if "music" in stages:
+            c.execute("UPDATE stage_cache SET music_info = ? WHERE video_hash = ?", (json.dumps(music), video_hash))
+        if "video_length" in stages:
+            c.execute("UPDATE stage_cache SET video_length = ? WHERE video_hash = ?", (stages["video_length"], video_hash))
+        c.execute("UPDATE stage_cache SET last_used = ? WHERE video_hash = ?", (now, video_hash))
+
+        # LRU eviction: keep only the CACHE_MAX_ENTRIES most recently used videos
+        c.execute(
+            "DELETE FROM stage_cache WHERE video_hash IN "
+            "(SELECT video_hash FROM stage_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (CACHE_MAX_ENTRIES,)
+        )
+        evicted = c.rowcount
+    if evicted > 0:
+        with _counter_lock:
+            _evictions += evicted
+
+def cache_stats():
+    with transaction(CACHE_DB_PATH) as c:
+        c.execute("SELECT COUNT(*) FROM stage_cache")
+        entries = c.fetchone()[0]
+    with _counter_lock:
+        return {
+            "entries": entries,
+            "max_entries": CACHE_MAX_ENTRIES,
+            "evictions": _evictions,
+            "hits": dict(_hits),
+            "misses": dict(_misses),
+        }
+
+@router.get("/analysis-cache/stats")
+async def api_cache_stats():
+    return await run_db(cache_stats)
+
+init_cache()
@@ -1,8 +1,14 @@
-import sqlite3
+import base64
+import json
+import os
+from datetime import date as Date
 from fastapi import APIRouter
 from pydantic import BaseModel
 
-DB_PATH = "analysis.sqlite3"
+from db import transaction, run_db
+from migrations import migrate
+
+DB_PATH = os.getenv("ANALYSIS_DB_PATH", "analysis.sqlite3")
 router = APIRouter()
 
 class DeleteAnalysisRequest(BaseModel):
@@ -17,51 +23,74 @@ class RenameAnalysisRequest(BaseModel):
     analysis_id: str
     new_title: str
 
+class InvalidCursorError(ValueError):
+    pass
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS analysis (
-        id TEXT PRIMARY KEY,
-        user_id TEXT NOT NULL,
-        title TEXT,
-        date TEXT,
-        result TEXT,
-        video_filename TEXT,
-        score INTEGER
-    )
-    """)
-    conn.commit()
-    conn.close()
+    migrate(DB_PATH)
 
 def insert_analysis(id, user_id, title, date, explanation, filename, score):
     """Insert a new analysis into the database."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO analysis (id, user_id, title, date, result, video_filename, score) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (id, user_id, title, date, explanation, filename, score)
-    )
-    conn.commit()
-    conn.close()
+    with transaction(DB_PATH) as c:
+        c.execute(
+            "INSERT INTO analysis (id, user_id, title, date, result, video_filename, score) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (id, user_id, title, date, explanation, filename, score)
+        )
+
+# Columns returned by the history endpoints: full rows vs the lightweight summary projection
+HISTORY_COLUMNS = ("id", "title", "date", "result", "video_filename")
+SUMMARY_COLUMNS = ("id", "title", "date", "score")
+
+def encode_cursor(date, rowid):
+    return base64.urlsafe_b64encode(json.dumps([date, rowid]).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor):
+    """(date, rowid) of the last row of the previous page; InvalidCursorError unless well-formed."""
+    try:
+        date, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(date, str) or type(rowid) is not int:
+            raise ValueError("cursor parts have the wrong types")
+        Date.fromisoformat(date)
+        return date, rowid
+    except Exception:
+        raise InvalidCursorError("Invalid cursor")
+
+def get_analysis_page(user_id, limit=None, cursor=None, summary=False):
+    """Return (analyses, next_cursor) for a user, newest first.
+
+    Keyset pagination on (date, rowid), so analyses of the same day come newest first too:
+    cursor is the next_cursor of the previous page and next_cursor is None on the last
+    page. limit=None returns everything after the cursor.
+    """
+    columns = SUMMARY_COLUMNS if summary else HISTORY_COLUMNS
+    query = f"SELECT {', '.join(columns)}, date, rowid FROM analysis WHERE user_id = ?"
+    params = [user_id]
+    if cursor:
+        query += " AND (date, rowid) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    query += " ORDER BY date DESC, rowid DESC"
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        query += " LIMIT ?"
+        params.append(limit + 1)
+
+    with transaction(DB_PATH) as c:
+        c.execute(query, params)
+        rows = c.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    return [dict(zip(columns, r)) for r in rows], next_cursor
 
 def get_analyses_for_user(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, title, date, result, video_filename FROM analysis WHERE user_id = ?", (user_id,))
-    rows = c.fetchall()
-    conn.close()
-    return [
-        {"id": r[0], "title": r[1], "date": r[2], "result": r[3], "video_filename": r[4]}
-        for r in rows
-    ]
+    return get_analysis_page(user_id)[0]
 
 def get_analysis_detail(user_id, analysis_id):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, user_id, title, date, result, video_filename, score FROM analysis WHERE user_id = ? AND id = ?", (user_id, analysis_id))
-    row = c.fetchone()
-    conn.close()
+    with transaction(DB_PATH) as c:
+        c.execute("SELECT id, user_id, title, date, result, video_filename, score FROM analysis WHERE user_id = ? AND id = ?", (user_id, analysis_id))
+        row = c.fetchone()
     if row:
         return {
             "id": row[0],
@@ -76,44 +105,35 @@ def get_analysis_detail(user_id, analysis_id):
 
 def delete_analysis(user_id, analysis_id):
     """Delete a specific analysis for a user."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM analysis WHERE user_id = ? AND id = ?", (user_id, analysis_id))
-    conn.commit()
-    conn.close()
+    with transaction(DB_PATH) as c:
+        c.execute("DELETE FROM analysis WHERE user_id = ? AND id = ?", (user_id, analysis_id))
 
 def delete_all_analyses_for_user(user_id):
     """Delete all analyses for a user."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM analysis WHERE user_id = ?", (user_id,))
-    conn.commit()
-    conn.close()
+    with transaction(DB_PATH) as c:
+        c.execute("DELETE FROM analysis WHERE user_id = ?", (user_id,))
 
 def rename_analysis(user_id, analysis_id, new_title):
     """Rename the title of a specific analysis for a user."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute(
-        "UPDATE analysis SET title = ? WHERE user_id = ? AND id = ?",
-        (new_title, user_id, analysis_id)
-    )
-    conn.commit()
-    conn.close()
+    with transaction(DB_PATH) as c:
+        c.execute(
+            "UPDATE analysis SET title = ? WHERE user_id = ? AND id = ?",
+            (new_title, user_id, analysis_id)
+        )
 
 @router.post("/delete_analysis")
-def api_delete_analysis(req: DeleteAnalysisRequest):
-    delete_analysis(req.user_id, req.analysis_id)
+async def api_delete_analysis(req: DeleteAnalysisRequest):
+    await run_db(delete_analysis, req.user_id, req.analysis_id)
     return {"status": "success"}
 
 @router.post("/delete_all_analyses")
-def api_delete_all_analyses(req: DeleteAllAnalysesRequest):
-    delete_all_analyses_for_user(req.user_id)
+async def api_delete_all_analyses(req: DeleteAllAnalysesRequest):
+    await run_db(delete_all_analyses_for_user, req.user_id)
     return {"status": "success"}
 
 @router.post("/rename_analysis")
-def api_rename_analysis(req: RenameAnalysisRequest):
-    rename_analysis(req.user_id, req.analysis_id, req.new_title)
+async def api_rename_analysis(req: RenameAnalysisRequest):
+    await run_db(rename_analysis, req.user_id, req.analysis_id, req.new_title)
     return {"status": "success"}
 
 init_db()
\ No newline at end of file
@@ -1,23 +1,37 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse
 import uuid
 import os
-import torch
 import logging
-from torchvision import transforms
-from PIL import Image
-import cv2
-import openai
 import tempfile
-import ffmpeg
-from shazamio import Shazam
-import whisper
 from datetime import datetime
-import clip
 import re
 import json
-
-from analyze_db import insert_analysis, get_analyses_for_user, get_analysis_detail
+import time
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Optional
+
+from analyze_db import insert_analysis, get_analysis_page, get_analysis_detail, InvalidCursorError
+from db import run_db
 from clerk_auth import get_current_user_id
+from model_registry import registry
+from job_queue import JobQueue, QueueFullError
+from analysis_cache import get_cached_stages, save_stages
+from uploads import save_upload
+from llm_gateway import chat_completion, chat_completion_stream, LLM_BACKEND
+from sse import sse_event, sse_response
+from metrics import STAGE_SECONDS
+from clip_inference import (
+    get_device, check_model_files, class_names, classify_frame_probs, iter_frames, planned_sample_count,
+    get_video_length, clip_model_identity, CLIP_BATCH_SIZE, KEYFRAME_FILTER
+)
+from keyframes import KeyframeFilter, KEYFRAME_DUPLICATE_THRESHOLD, SCENE_CUT_THRESHOLD
+from action_aggregator import (
+    ActionAggregator, ACTION_AGGREGATION, ACTION_EARLY_EXIT_MIN_FRAMES, ACTION_EARLY_EXIT_MIN_PROGRESS, ACTION_EARLY_EXIT_Z
+)
 
 router = APIRouter()
 
@@ -25,50 +39,77 @@ router = APIRouter()
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logging.info("Initializing analyzeapi.py")
 
-# Load CLIP model
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-logging.info(f"Using device: {device}")
-
-# Check model path
-model_path = "../fine_tuned_clip.pth"
-if not os.path.exists(model_path):
-    logging.error(f"Model path not found: {model_path}")
-    raise FileNotFoundError(f"Model file not found at {model_path}")
-
-try:
-    clip_model, preprocess = clip.load("ViT-B/32", device=device)
-    logging.info("Original CLIP model loaded.")
-    clip_model.load_state_dict(torch.load(model_path, map_location=device))
-    clip_model.to(device)
-    clip_model.eval()
-    logging.info("Fine-tuned CLIP weights loaded and model set to eval mode.")
-except Exception as e:
-    logging.error(f"Failed to load CLIP model or weights: {e}")
-    raise e
-
-# Check OpenAI key
-if not os.getenv("OPENAI_API_KEY"):
+# Fail at startup rather than on the first upload when the CLIP weights are missing.
+# torch, clip, whisper, cv2 and friends are imported inside the functions that use them,
+# so the server (and routers that never touch a model) start without paying for them.
+check_model_files()
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+
+# Check OpenAI key (not needed when the LLM gateway uses its fake backend)
+if LLM_BACKEND != "fake" and not os.getenv("OPENAI_API_KEY"):
     logging.error("OPENAI_API_KEY is not set in environment.")
     raise EnvironmentError("OPENAI_API_KEY environment variable is not configured.")
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# Class names
-class_names = [
-    "skateboarding", "guitar playing", "cooking", "playing piano", "soccer juggling",
-    "basketball dunk", "yoga", "weightlifting", "running", "biking", "swimming", "surfing",
-    "boxing", "dancing", "karate", "walking a dog", "fishing", "skiing", "snowboarding",
-    "playing drums", "parkour", "typing on a keyboard", "playing violin", "jump rope", "tennis serve"
-]
+# Threads for the blocking pipeline stages (CLIP, ffmpeg, Whisper, GPT, DB)
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="analyze")
+
+# Background analysis jobs (POST /analyze?background=true)
+ANALYZE_JOB_WORKERS = int(os.getenv("ANALYZE_JOB_WORKERS", "2"))
+ANALYZE_QUEUE_SIZE = int(os.getenv("ANALYZE_QUEUE_SIZE", "8"))
+ANALYZE_JOB_TTL = int(os.getenv("ANALYZE_JOB_TTL", "3600"))
+analysis_jobs = JobQueue(workers=ANALYZE_JOB_WORKERS, max_pending=ANALYZE_QUEUE_SIZE, result_ttl=ANALYZE_JOB_TTL)
+
+ANALYSIS_SYSTEM_PROMPT = "You are an expert video and music analyst. Analyze the prompt and predict the virality of this video based on several factors, then offer improvements."
+
+def load_whisper():
+    import whisper
+    return whisper.load_model(WHISPER_MODEL, device=get_device())
+
+# Whisper's transcribe installs temporary hooks on the model, so calls must not overlap
+registry.register("whisper", load_whisper, thread_safe=False)
+
+def transcribe_audio(audio_path):
+    whisper_model = registry.get("whisper")
+    with registry.inference_lock("whisper"):
+        return whisper_model.transcribe(audio_path)
 
 @router.get("/analyze/history")
-def get_analyze_history(user_id: str = Depends(get_current_user_id)):
+async def get_analyze_history(
+    user_id: str = Depends(get_current_user_id),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    summary: bool = False
+):
+    """Newest-first history. With limit set, the next page's cursor is sent in the X-Next-Cursor header."""
     logging.info("GET /analyze/history called.")
-    return get_analyses_for_user(user_id)
+    try:
+        analyses, next_cursor = await run_db(get_analysis_page, user_id, limit, cursor, summary)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return JSONResponse(content=analyses, headers=headers)
+
+@router.on_event("startup")
+async def start_analysis_jobs():
+    analysis_jobs.start()
+
+@router.on_event("shutdown")
+async def stop_analysis_jobs():
+    await analysis_jobs.stop()
+
+@router.get("/analyze/jobs/{job_id}")
+async def get_analyze_job(job_id: str, user_id: str = Depends(get_current_user_id)):
+    job = analysis_jobs.get(job_id, user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.get("/analyze/{analysis_id}")
-def get_analyze_detail_endpoint(analysis_id: str, user_id: str = Depends(get_current_user_id)):
+async def get_analyze_detail_endpoint(analysis_id: str, user_id: str = Depends(get_current_user_id)):
     logging.info(f"GET /analyze/{analysis_id} called.")
-    detail = get_analysis_detail(user_id, analysis_id)
+    detail = await run_db(get_analysis_detail, user_id, analysis_id)
     if not detail:
         raise HTTPException(status_code=404, detail="Analysis not found")
     return detail
@@ -77,70 +118,364 @@ def get_analyze_detail_endpoint(analysis_id: str, user_id: str = Depends(get_cur
 async def analyze_video(
     video: UploadFile = File(...),
     user_id: str = Depends(get_current_user_id),
-    frame_interval: int = 30
+    # Non-positive values would decode every frame of the video
+    frame_interval: int = Query(30, ge=1),
+    sample_fps: Optional[float] = Query(None, gt=0),
+    num_frames: Optional[int] = Query(None, ge=1),
+    background: bool = False,
+    stream: bool = False
 ):
     logging.info("POST /analyze called.")
+    if background and analysis_jobs.is_full():
+        return queue_full_response()
     temp_dir = tempfile.gettempdir()
     temp_video_path = os.path.join(temp_dir, f"{uuid.uuid4()}.mp4")
-    temp_audio_path = os.path.join(temp_dir, f"{uuid.uuid4()}.mp3")
+    timings = {}
+    handed_to_job = False
 
     try:
         logging.info("Saving uploaded video to temporary directory.")
-        with open(temp_video_path, "wb") as f:
-            f.write(await video.read())
-        logging.info(f"Video saved to: {temp_video_path}")
-
-        logging.info(f"Extracting frames every {frame_interval} frames.")
-        frames = extract_frames(temp_video_path, frame_interval)
-        logging.info(f"Extracted {len(frames)} frames.")
-
-        if not frames:
-            raise HTTPException(status_code=400, detail="No frames extracted from video.")
-
-        logging.info("Classifying frames with CLIP model.")
-        class_votes = []
-        with torch.no_grad():
-            text_inputs = torch.cat([clip.tokenize(f"a photo of a person doing {c}") for c in class_names]).to(device)
-            text_features = clip_model.encode_text(text_inputs)
-
-            for i, frame in enumerate(frames):
-                image_input = preprocess(frame).unsqueeze(0).to(device)
-                image_features = clip_model.encode_image(image_input)
-                logits = (image_features @ text_features.T).softmax(dim=-1)
-                top_class = logits.argmax().item()
-                predicted_label = class_names[top_class]
-                class_votes.append(predicted_label)
-                logging.info(f"Frame {i} predicted as: {predicted_label}")
-
-        most_common_action = max(set(class_votes), key=class_votes.count)
-        logging.info(f"Predicted action: {most_common_action}")
-
-        logging.info("Extracting audio from video.")
-        ffmpeg.input(temp_video_path).output(temp_audio_path).run(overwrite_output=True, quiet=True)
-        logging.info(f"Audio extracted to: {temp_audio_path}")
-
-        logging.info("Transcribing audio with Whisper.")
-        whisper_model = whisper.load_model("base")
-        transcription_result = whisper_model.transcribe(temp_audio_path)
-        transcription = transcription_result.get("text", "")
-        logging.info(f"Transcription: {transcription if transcription else 'None'}")
-
-        logging.info("Recognizing music with Shazamio.")
-        shazam = Shazam()
-        shazam_result = await shazam.recognize(temp_audio_path)
-        music_info = shazam_result.get("track", {})
-        logging.info(f"Music recognition: {music_info if music_info else 'No track info found'}")
-
-        chatgpt_prompt = f"""
+        start = time.perf_counter()
+        video_hash, video_size = await save_upload(video, temp_video_path)
+        record_timing(timings, "upload_write", time.perf_counter() - start)
+        logging.info(f"Video saved to: {temp_video_path} ({video_size} bytes, sha256 {video_hash})")
+
+        if background:
+            def job():
+                return run_analysis(
+                    temp_video_path, video.filename, user_id, frame_interval, sample_fps, num_frames, timings,
+                    video_hash
+                )
+
+            try:
+                # The queue removes the file once the job is over, also if it never runs
+                job_id = analysis_jobs.submit(user_id, job, cleanup=lambda: remove_temp_file(temp_video_path))
+            except QueueFullError:
+                return queue_full_response()
+            handed_to_job = True
+            logging.info(f"Queued analysis job {job_id} for user {user_id}")
+            return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+        if stream:
+            events = stream_analysis(
+                temp_video_path, video.filename, user_id, frame_interval, sample_fps, num_frames, timings, video_hash
+            )
+            # The analysis task is running now and removes the file itself, even if the
+            # client disconnects before the response is iterated
+            handed_to_job = True
+            return sse_response(events)
+
+        return await run_analysis(
+            temp_video_path, video.filename, user_id, frame_interval, sample_fps, num_frames, timings, video_hash
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Analysis failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    finally:
+        if not handed_to_job:
+            remove_temp_file(temp_video_path)
+
+streaming_analyses = set()  # keeps running streamed analyses referenced after a client disconnects
+
+def stream_analysis(video_path, filename, user_id, frame_interval, sample_fps, num_frames, timings, video_hash):
+    """Start the analysis and return its SSE events for POST /analyze?stream=true.
+
+    'started' goes out at once, 'token' events carry the GPT reply as it is written,
+    and 'result' has the same body as the non-streamed response ('error' on failure).
+    The analysis task owns video_path from here on and removes it when it finishes.
+    """
+    events = asyncio.Queue()
+
+    async def analysis():
+        try:
+            return await run_analysis(
+                video_path, filename, user_id, frame_interval, sample_fps, num_frames, timings, video_hash,
+                on_token=lambda text: events.put_nowait(("token", {"text": text})),
+            )
+        finally:
+            remove_temp_file(video_path)
+            events.put_nowait(None)
+
+    # A client that disconnects does not cancel the analysis; it is still saved to the history
+    task = asyncio.create_task(analysis())
+    streaming_analyses.add(task)
+    task.add_done_callback(streaming_analyses.discard)
+    return analysis_events(task, events, filename)
+
+async def analysis_events(task, events, filename):
+    yield sse_event("started", {"video_filename": filename})
+    while True:
+        item = await events.get()
+        if item is None:
+            break
+        yield sse_event(*item)
+    try:
+        yield sse_event("result", await asyncio.shield(task))
+    except HTTPException as e:
+        yield sse_event("error", {"status": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logging.error(f"Analysis failed: {e}")
+        yield sse_event("error", {"status": 500, "detail": str(e)})
+
+def queue_full_response():
+    logging.warning("Analysis queue is full, rejecting request.")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many analyses in progress, try again shortly."},
+        headers={"Retry-After": "30"},
+    )
+
+def remove_temp_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+        logging.info(f"Removed temporary file: {path}")
+
+def record_timing(timings, name, seconds):
+    """Put a stage duration in the response timings and in the analyze_stage_seconds histogram."""
+    timings[name] = round(seconds, 3)
+    STAGE_SECONDS.observe(seconds, stage=name)
+
+def timed_frames(frames, totals):
+    """Pass frames through, adding the time spent producing them to totals["frame_extraction"]."""
+    frames = iter(frames)
+    while True:
+        start = time.perf_counter()
+        try:
+            frame = next(frames)
+        except StopIteration:
+            totals["frame_extraction"] += time.perf_counter() - start
+            return
+        totals["frame_extraction"] += time.perf_counter() - start
+        yield frame
+
+async def timed_stage(timings, name, fn, *args):
+    """Run one pipeline stage and record its duration in timings[name].
+
+    Coroutine functions (including run_db) are awaited directly, blocking functions run
+    on the pipeline executor so torch/whisper/ffmpeg work never blocks the event loop.
+    """
+    start = time.perf_counter()
+    try:
+        if inspect.iscoroutinefunction(fn):
+            return await fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(pipeline_executor, fn, *args)
+    finally:
+        record_timing(timings, name, time.perf_counter() - start)
+
+def classify_video(video_path, frame_interval=30, sample_fps=None, num_frames=None, keyframe_filter=None,
+                   early_exit=True, timings=None):
+    """Classify the sampled frames and return the visual stage result.
+
+    Probabilities are aggregated batch by batch (ActionAggregator). With early_exit,
+    decoding and classification stop as soon as the leading action is decided. With a
+    keyframe_filter only the frames it keeps are classified, each weighted by the
+    number of sampled frames it stands for. Decoding and CLIP interleave, so with
+    timings their shares are recorded separately as frame_extraction and clip.
+    """
+    logging.info(f"Classifying sampled frames with CLIP model (batch size {CLIP_BATCH_SIZE}).")
+    aggregator = ActionAggregator(class_names)
+    planned = planned_sample_count(video_path, frame_interval, sample_fps, num_frames) if early_exit else 0
+    weights = None
+    stopped_early = False
+    frames = iter_frames(video_path, frame_interval, sample_fps, num_frames, keyframe_filter)
+    totals = {"frame_extraction": 0.0}
+    start = time.perf_counter()
+    # closing() releases the video capture right away when we stop early
+    with closing(frames), closing(classify_frame_probs(timed_frames(frames, totals), CLIP_BATCH_SIZE)) as batches:
+        for probs in batches:
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                for i, idx in enumerate(probs.argmax(axis=-1).tolist(), start=aggregator.frame_count):
+                    logging.debug(f"Frame {i} predicted as: {class_names[idx]}")
+            aggregator.add(probs)
+            weights = keyframe_filter.weights if keyframe_filter is not None else None
+            sampled = keyframe_filter.candidates if keyframe_filter is not None else aggregator.frame_count
+            if early_exit and planned and aggregator.decided(weights, progress=sampled / planned):
+                stopped_early = True
+                break
+    logging.info(f"Classified {aggregator.frame_count} frames" + (" (stopped early)." if stopped_early else "."))
+    if timings is not None:
+        record_timing(timings, "frame_extraction", totals["frame_extraction"])
+        record_timing(timings, "clip", time.perf_counter() - start - totals["frame_extraction"])
+
+    visual = {
+        "predicted_action": aggregator.predicted_action(weights),
+        "top_actions": aggregator.top_actions(weights=weights),
+        "frame_count": aggregator.frame_count,
+        "sampled_frames": keyframe_filter.candidates if keyframe_filter is not None else aggregator.frame_count,
+        "stopped_early": stopped_early,
+    }
+    if keyframe_filter is not None:
+        visual["keyframes"] = keyframe_filter.report()
+        logging.info(f"Keyframe filter: {visual['keyframes']}")
+    return visual
+
+def extract_audio(video_path, audio_path):
+    import ffmpeg
+    logging.info("Extracting audio from video.")
+    ffmpeg.input(video_path).output(audio_path).run(overwrite_output=True, quiet=True)
+    logging.info(f"Audio extracted to: {audio_path}")
+
+def transcribe(audio_path):
+    logging.info("Transcribing audio with Whisper.")
+    transcription = transcribe_audio(audio_path).get("text", "")
+    logging.info(f"Transcription: {transcription if transcription else 'None'}")
+    return transcription
+
+async def recognize_music(audio_path):
+    from shazamio import Shazam
+    logging.info("Recognizing music with Shazamio.")
+    shazam = Shazam()
+    shazam_result = await shazam.recognize(audio_path)
+    music_info = shazam_result.get("track", {})
+    logging.info(f"Music recognition: {music_info if music_info else 'No track info found'}")
+    return music_info
+
+async def analyze_visuals(video_path, frame_interval, sample_fps, num_frames, timings):
+    """Visual branch of the pipeline: the predicted action, the top actions and how many frames were classified."""
+    keyframe_filter = KeyframeFilter() if KEYFRAME_FILTER else None
+    visual = await timed_stage(
+        timings, "visual", classify_video, video_path, frame_interval, sample_fps, num_frames, keyframe_filter,
+        True, timings
+    )
+    if not visual["frame_count"]:
+        raise HTTPException(status_code=400, detail="No frames extracted from video.")
+    logging.info(f"Predicted action: {visual['predicted_action']} (top actions {visual['top_actions']})")
+    return visual
+
+async def analyze_audio(video_path, audio_path, timings, stages=("transcription", "music")):
+    """Audio branch of the pipeline: extract once, then transcribe and recognize music in parallel."""
+    await timed_stage(timings, "audio_extract", extract_audio, video_path, audio_path)
+    runners = {
+        "transcription": lambda: timed_stage(timings, "whisper", transcribe, audio_path),
+        "music": lambda: timed_stage(timings, "shazam", recognize_music, audio_path),
+    }
+    results = await asyncio.gather(*(runners[stage]() for stage in stages))
+    return dict(zip(stages, results))
+
+def frame_sampling_key(frame_interval, sample_fps, num_frames):
+    key = f"interval={frame_interval};fps={sample_fps};n={num_frames}"
+    if KEYFRAME_FILTER:
+        key += f";keyframes={KEYFRAME_DUPLICATE_THRESHOLD}/{SCENE_CUT_THRESHOLD}"
+    key += f";actions={ACTION_AGGREGATION}/{ACTION_EARLY_EXIT_Z}/{ACTION_EARLY_EXIT_MIN_FRAMES}/{ACTION_EARLY_EXIT_MIN_PROGRESS}"
+    # A different classifier, precision or batching gives different probabilities, so
+    # cached visuals do not carry over; the identity names the precision explicitly
+    key += f";model={clip_model_identity()};batch={CLIP_BATCH_SIZE}"
+    return key
+
+async def run_analysis(
+    video_path, filename, user_id, frame_interval=30, sample_fps=None, num_frames=None, timings=None, video_hash=None,
+    on_token=None
+):
+    """Run the analysis pipeline on a saved video, store the result and return the API response.
+
+    When video_hash is given, stage results cached for the same upload are reused and
+    only the missing stages run. on_token receives the GPT reply piece by piece as it streams.
+    """
+    timings = {} if timings is None else timings
+    audio_path = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.mp3")
+    pipeline_start = time.perf_counter()
+    frame_params = frame_sampling_key(frame_interval, sample_fps, num_frames)
+
+    try:
+        cached = {}
+        if video_hash:
+            cached = await timed_stage(timings, "cache_lookup", run_db, get_cached_stages, video_hash, frame_params)
+            if cached:
+                logging.info(f"Reusing cached stages for {video_hash}: {sorted(cached)}")
+
+        # The visual and audio branches are independent, so they run side by side.
+        # Both are awaited to completion before any error is raised so no stage
+        # keeps writing to the temporary files while they are being removed.
+        branches = {}
+        if "visual" not in cached:
+            branches["visual"] = analyze_visuals(video_path, frame_interval, sample_fps, num_frames, timings)
+        if "video_length" not in cached:
+            branches["video_length"] = timed_stage(timings, "video_length", get_video_length, video_path)
+        audio_stages = tuple(stage for stage in ("transcription", "music") if stage not in cached)
+        if audio_stages:
+            branches["audio"] = analyze_audio(video_path, audio_path, timings, audio_stages)
+
+        results = await asyncio.gather(*branches.values(), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        computed = dict(zip(branches, results))
+        computed.update(computed.pop("audio", {}))
+
+        if video_hash and computed:
+            await timed_stage(timings, "cache_store", run_db, save_stages, video_hash, frame_params, computed)
+
+        stages = {**cached, **computed}
+        most_common_action = stages["visual"]["predicted_action"]
+        transcription = stages["transcription"]
+        music_info = stages["music"]
+        video_length = stages["video_length"]
+
+        chatgpt_prompt = build_analysis_prompt(
+            transcription, music_info, most_common_action, stages["visual"]["frame_count"], filename, video_length,
+            stages["visual"].get("top_actions"), stages["visual"].get("sampled_frames")
+        )
+        chatgpt_text = await timed_stage(timings, "gpt", request_analysis, chatgpt_prompt, user_id, on_token)
+        score, explanation = parse_analysis_response(chatgpt_text)
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        new_id = str(uuid.uuid4())
+
+        # Save explanation as 'result' in the DB
+        await timed_stage(
+            timings, "db_insert", run_db, insert_analysis,
+            new_id, user_id, f"Analysis {today}", today, explanation, filename, score
+        )
+        logging.info(f"Inserted analysis ID {new_id} for user {user_id}")
+        record_timing(timings, "pipeline_total", time.perf_counter() - pipeline_start)
+
+        return {
+            "id": new_id,
+            "title": f"Analysis {today}",
+            "date": today,
+            "result": explanation,  # Still return as 'result' in API
+            "video_filename": filename,
+            "predicted_action": most_common_action,
+            "top_actions": stages["visual"].get("top_actions", []),
+            "transcription": transcription,
+            "music_info": music_info,
+            "score": score,
+            "keyframes": stages["visual"].get("keyframes"),
+            "timings": timings,
+            "cached_stages": sorted(cached),
+        }
+
+    finally:
+        remove_temp_file(audio_path)
+
+def format_top_actions(top_actions):
+    if not top_actions:
+        return "None"
+    return ", ".join(f"{a['action']} ({a['confidence']:.0%})" for a in top_actions)
+
+def format_frame_counts(frame_count, sampled_frames):
+    # Early exit and the keyframe filter classify fewer frames than were sampled
+    if sampled_frames is None or sampled_frames == frame_count:
+        return f"{frame_count} frames classified"
+    return f"{frame_count} frames classified out of {sampled_frames} sampled"
+
+def build_analysis_prompt(transcription, music_info, most_common_action, frame_count, filename, video_length,
+                          top_actions=None, sampled_frames=None):
+    return f"""
 You are an expert video and music analyst. Analyze the following video content for virality and improvement potential.
 The data of the video: 
 
 Transcription: {transcription if transcription else "None"},
 Music Info: {music_info if music_info else "No track info found"},
 Most Common Action: {most_common_action if most_common_action else "None"}.
-Analyzed Video Frames: {len(frames)} frames extracted.
-Filename: {video.filename}.
-Video Length: {get_video_length(temp_video_path)} seconds.
+Top Actions (with confidence): {format_top_actions(top_actions)}.
+Analyzed Video Frames: {format_frame_counts(frame_count, sampled_frames)}.
+Filename: {filename}.
+Video Length: {video_length} seconds.
 
 Determine the topic of the video based on all that information.
 Add a score from 0 to 100 based on the following factors:
@@ -173,89 +508,33 @@ Give it in JSON format with the following structure:
 }}
 """
 
-        logging.info("Sending prompt to ChatGPT.")
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        chat_response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert video and music analyst. Analyze the prompt and predict the virality of this video based on several factors, then offer improvements."},
-                {"role": "user", "content": chatgpt_prompt},
-            ],
-            max_tokens=700
-        )
-        chatgpt_text = chat_response.choices[0].message.content.strip()
-        logging.info(f"ChatGPT Response: {chatgpt_text}")
-
-        # Parse JSON from GPT response
-        try:
-            chatgpt_text_clean = re.sub(r"^```json|^```|```$", "", chatgpt_text, flags=re.MULTILINE).strip()
-            gpt_result = json.loads(chatgpt_text_clean)
-            score = int(gpt_result.get("score", 0))
-            explanation = gpt_result.get("explanation", "")
-        except Exception as e:
-            logging.error(f"Failed to parse GPT response as JSON: {e}")
-            score = 0
-            explanation = chatgpt_text
-
-        today = datetime.now().strftime("%Y-%m-%d")
-        new_id = str(uuid.uuid4())
-
-        # Save explanation as 'result' in the DB
-        insert_analysis(new_id, user_id, f"Analysis {today}", today, explanation, video.filename, score)
-        logging.info(f"Inserted analysis ID {new_id} for user {user_id}")
-
-        return {
-            "id": new_id,
-            "title": f"Analysis {today}",
-            "date": today,
-            "result": explanation,  # Still return as 'result' in API
-            "video_filename": video.filename,
-            "predicted_action": most_common_action,
-            "transcription": transcription,
-            "music_info": music_info,
-            "score": score,
-        }
-
-    except Exception as e:
-        logging.error(f"Analysis failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-
-    finally:
-        if os.path.exists(temp_video_path):
-            os.remove(temp_video_path)
-            logging.info(f"Removed temporary video: {temp_video_path}")
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
-            logging.info(f"Removed temporary audio: {temp_audio_path}")
-
-def extract_frames(video_path, frame_interval=30):
-    logging.info("extract_frames function called.")
-    frames = []
-    cap = cv2.VideoCapture(video_path)
-    frame_count = 0
-    success, image = cap.read()
-
-    while success:
-        if frame_count % frame_interval == 0:
-            rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(rgb_image)
-            frames.append(pil_image)
-        success, image = cap.read()
-        frame_count += 1
-
-    cap.release()
-    logging.info("Frames extraction complete.")
-    return frames
-
-def get_video_length(video_path):
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        return 0
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
-    cap.release()
-    if fps > 0:
-        duration = frame_count / fps
+async def request_analysis(chatgpt_prompt, user_id=None, on_token=None):
+    """Ask GPT for the score and explanation. With on_token, the reply is streamed and each piece passed to it."""
+    logging.info("Sending prompt to ChatGPT.")
+    messages = [
+        {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+        {"role": "user", "content": chatgpt_prompt},
+    ]
+    if on_token is None:
+        chatgpt_text = await chat_completion(messages, max_tokens=700, user_id=user_id, purpose="analyze")
     else:
-        duration = 0
-    return duration  # duration in seconds
\ No newline at end of file
+        parts = []
+        async for delta in chat_completion_stream(messages, max_tokens=700, user_id=user_id, purpose="analyze"):
+            parts.append(delta)
+            on_token(delta)
+        chatgpt_text = "".join(parts).strip()
+    logging.info(f"ChatGPT Response: {chatgpt_text}")
+    return chatgpt_text
+
+def parse_analysis_response(chatgpt_text):
+    """Parse the JSON score/explanation from the GPT response, falling back to the raw text."""
+    try:
+        chatgpt_text_clean = re.sub(r"^```json|^```|```$", "", chatgpt_text, flags=re.MULTILINE).strip()
+        gpt_result = json.loads(chatgpt_text_clean)
+        score = int(gpt_result.get("score", 0))
+        explanation = gpt_result.get("explanation", "")
+    except Exception as e:
+        logging.error(f"Failed to parse GPT response as JSON: {e}")
+        score = 0
+        explanation = chatgpt_text
+    return score, explanation
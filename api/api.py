@@ -4,9 +4,21 @@ from trendsapi import router as trends_router
 from analyzeapi import router as analyze_router
 from analyze_db import router as analyze_db_router
 from ainewsapi import router as ainews_router
+from model_registry import router as model_registry_router
+from analysis_cache import router as analysis_cache_router
+from uploads import MaxBodySizeMiddleware
+from llm_gateway import router as llm_gateway_router
+from metrics import router as metrics_router
+from profiler import ProfilerMiddleware
 
 app = FastAPI()
 
+# Refuse oversized video uploads while they are still arriving
+app.add_middleware(MaxBodySizeMiddleware)
+
+# Sample the stacks of requests sent with X-Profile: 1 (only when PROFILE_REQUESTS=1)
+app.add_middleware(ProfilerMiddleware)
+
 # Allow CORS for local dev
 app.add_middleware(
     CORSMiddleware,
@@ -14,6 +26,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Profile-File"],
 )
 
 # Include routers
@@ -21,6 +34,10 @@ app.include_router(trends_router)
 app.include_router(analyze_router)
 app.include_router(analyze_db_router)
 app.include_router(ainews_router)
+app.include_router(model_registry_router)
+app.include_router(analysis_cache_router)
+app.include_router(llm_gateway_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     import uvicorn
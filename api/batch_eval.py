@@ -0,0 +1,262 @@
+"""
+Classify a corpus of videos offline with the same frame sampling and CLIP code as
+POST /analyze, and report throughput.
+
+Videos are decoded in a process pool (iter_frames, plus the keyframe filter unless
+--no-keyframe-filter), and their frames are batched across videos into shared CLIP
+forward passes. Early exit is off, so every sampled frame votes and results are
+reproducible. One record per video (predicted_action, top_actions, frame counts) is
+written to --out as JSONL, or Parquet when it ends in .parquet (needs pyarrow).
+
+Inputs are video files, folders of videos, or --manifest: a .jsonl file of
+{"path": ..., "label": ...} lines, or a text file with one path per line (relative
+paths are relative to the manifest). With labels, which --labels-from-dirs takes from
+each video's folder name, the accuracy is reported too.
+
+Run from the api folder:
+    python batch_eval.py ../samples --out ../eval.jsonl
+    python batch_eval.py --manifest ../eval/manifest.jsonl --out ../eval.parquet --workers 8 --batch-size 32
+"""
+import argparse
+import importlib.util
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from action_aggregator import ActionAggregator
+from clip_inference import (
+    CLIP_BATCH_SIZE, KEYFRAME_FILTER, check_model_files, class_names, classify_frame_probs, iter_frames
+)
+from keyframes import KeyframeFilter
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm")
+# CLIP's preprocess starts by resizing the short side to the model's input resolution
+# (224 for the CLIP_BACKBONE of clip_inference). Doing that in the decode workers keeps
+# the frames sent back small; preprocess then sees an image of the target size and
+# leaves it unchanged.
+CLIP_INPUT_SIZE = 224
+
+
+def video_jobs(paths, manifest=None, labels_from_dirs=False):
+    """(path, label) for every video to classify; label is None when unknown."""
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if manifest.endswith(".jsonl"):
+                    entry = json.loads(line)
+                    path, label = entry["path"], entry.get("label")
+                else:
+                    path, label = line, None
+                yield os.path.join(base, path), label
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                for name in sorted(files):
+                    if name.lower().endswith(VIDEO_EXTENSIONS):
+                        label = os.path.basename(root) if labels_from_dirs else None
+                        yield os.path.join(root, name), label
+        else:
+            yield path, os.path.basename(os.path.dirname(os.path.abspath(path))) if labels_from_dirs else None
+
+
+def shrink(image):
+    """Resize a PIL frame the way CLIP's preprocess does first (short side to CLIP_INPUT_SIZE)."""
+    from PIL import Image
+    width, height = image.size
+    if min(width, height) == CLIP_INPUT_SIZE:
+        return image
+    if width <= height:
+        size = (CLIP_INPUT_SIZE, int(CLIP_INPUT_SIZE * height / width))
+    else:
+        size = (int(CLIP_INPUT_SIZE * width / height), CLIP_INPUT_SIZE)
+    return image.resize(size, Image.BICUBIC)
+
+
+def decode_video(path, label, frame_interval, sample_fps, num_frames, keyframe_filter):
+    """Runs in a pool worker: the sampled frames of one video as uint8 arrays, ready for preprocess."""
+    import cv2
+    # The pool already runs one video per core
+    cv2.setNumThreads(1)
+    start = time.perf_counter()
+    result = {"path": path, "label": label, "frames": [], "weights": None, "sampled_frames": 0, "error": None}
+    try:
+        keyframes = KeyframeFilter() if keyframe_filter else None
+        for image in iter_frames(path, frame_interval, sample_fps, num_frames, keyframes):
+            result["frames"].append(np.asarray(shrink(image)))
+        result["sampled_frames"] = keyframes.candidates if keyframes is not None else len(result["frames"])
+        if keyframes is not None:
+            result["weights"] = keyframes.weights
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["decode_seconds"] = time.perf_counter() - start
+    return result
+
+
+def decoded_videos(jobs, workers, decode_args):
+    """decode_video results in job order, with at most 2 * workers videos decoded ahead."""
+    if workers <= 0:
+        for path, label in jobs:
+            yield decode_video(path, label, *decode_args)
+        return
+    # spawn, not fork: the parent has torch's thread pools running by the time more videos are submitted
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        jobs = iter(jobs)
+        pending = deque()
+        for path, label in jobs:
+            pending.append(pool.submit(decode_video, path, label, *decode_args))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            result = pending.popleft().result()
+            next_job = next(jobs, None)
+            if next_job is not None:
+                pending.append(pool.submit(decode_video, *next_job, *decode_args))
+            yield result
+
+
+def video_record(video, aggregator=None):
+    record = {
+        "path": video["path"],
+        "label": video["label"],
+        "predicted_action": None,
+        "top_actions": [],
+        "frame_count": 0,
+        "sampled_frames": video["sampled_frames"],
+        "decode_seconds": round(video["decode_seconds"], 3),
+        "error": video["error"],
+    }
+    if aggregator is not None and aggregator.frame_count:
+        record["predicted_action"] = aggregator.predicted_action(video["weights"])
+        record["top_actions"] = aggregator.top_actions(weights=video["weights"])
+        record["frame_count"] = aggregator.frame_count
+    elif video["error"] is None:
+        record["error"] = "no frames decoded"
+    return record
+
+
+def classify_videos(videos, batch_size):
+    """Yield one record per decoded video, classifying frames of consecutive videos in shared batches."""
+    from PIL import Image
+    owners = deque()  # the video of each frame handed to CLIP, in order
+    open_videos = {}  # id -> [video, aggregator, frames not classified yet]
+    finished = deque()
+
+    def frames():
+        for video_id, video in enumerate(videos):
+            if not video["frames"]:
+                finished.append(video_record(video))
+                continue
+            open_videos[video_id] = [video, ActionAggregator(class_names), len(video["frames"])]
+            for array in video.pop("frames"):
+                owners.append(video_id)
+                yield Image.fromarray(array)
+
+    for probs in classify_frame_probs(frames(), batch_size):
+        start = 0
+        while start < len(probs):
+            video_id = owners[0]
+            end = start
+            while end < len(probs) and owners[0] == video_id:
+                owners.popleft()
+                end += 1
+            entry = open_videos[video_id]
+            entry[1].add(probs[start:end])
+            entry[2] -= end - start
+            if entry[2] == 0:
+                del open_videos[video_id]
+                finished.append(video_record(entry[0], entry[1]))
+            start = end
+        while finished:
+            yield finished.popleft()
+    # Videos without frames after the last batch
+    while finished:
+        yield finished.popleft()
+
+
+class RecordWriter:
+    """Streams records to JSONL, or collects them for one Parquet file at the end."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.records = []
+        self.file = None if self.parquet else open(path, "w")
+
+    def write(self, record):
+        if self.parquet:
+            self.records.append(record)
+        else:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if not self.parquet:
+            self.file.close()
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.Table.from_pylist(self.records), self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="Video files or folders of videos")
+    parser.add_argument("--manifest", default=None, help=".jsonl of {path, label} or a text file of paths")
+    parser.add_argument("--labels-from-dirs", action="store_true", help="Use each video's folder name as its label")
+    parser.add_argument("--out", default="batch_eval.jsonl", help="Output file, .jsonl or .parquet")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode processes (0 decodes inline)")
+    parser.add_argument("--batch-size", type=int, default=CLIP_BATCH_SIZE, help="Frames per CLIP forward pass")
+    parser.add_argument("--frame-interval", type=int, default=30)
+    parser.add_argument("--sample-fps", type=float, default=None)
+    parser.add_argument("--num-frames", type=int, default=None)
+    parser.add_argument("--no-keyframe-filter", action="store_true", help="Classify every sampled frame")
+    args = parser.parse_args()
+    if not args.paths and not args.manifest:
+        parser.error("give video paths or --manifest")
+    check_model_files()
+    if args.out.endswith(".parquet") and importlib.util.find_spec("pyarrow") is None:
+        # Fail before decoding anything rather than after the whole corpus
+        parser.error("writing .parquet needs pyarrow (pip install pyarrow)")
+
+    keyframe_filter = KEYFRAME_FILTER and not args.no_keyframe_filter
+    decode_args = (args.frame_interval, args.sample_fps, args.num_frames, keyframe_filter)
+    jobs = video_jobs(args.paths, args.manifest, args.labels_from_dirs)
+
+    totals = {"videos": 0, "failed": 0, "frames": 0, "sampled": 0, "labelled": 0, "correct": 0}
+    writer = RecordWriter(args.out)
+    start = time.perf_counter()
+    try:
+        for record in classify_videos(decoded_videos(jobs, args.workers, decode_args), args.batch_size):
+            writer.write(record)
+            totals["videos"] += 1
+            totals["failed"] += int(record["error"] is not None)
+            totals["frames"] += record["frame_count"]
+            totals["sampled"] += record["sampled_frames"]
+            if record["label"] is not None and record["predicted_action"] is not None:
+                totals["labelled"] += 1
+                totals["correct"] += int(record["predicted_action"] == record["label"])
+            status = record["error"] or f"{record['predicted_action']} ({record['frame_count']} frames)"
+            print(f"{totals['videos']:>6}  {os.path.basename(record['path'])[:40]:<42}{status}")
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{totals['videos']} videos ({totals['failed']} failed) in {elapsed:.1f}s -> {args.out}")
+    print(f"{totals['videos'] / elapsed:.2f} videos/sec, {totals['frames'] / elapsed:.1f} frames/sec classified, "
+          f"{totals['sampled'] / elapsed:.1f} frames/sec sampled "
+          f"(workers={args.workers}, batch size={args.batch_size}, keyframe filter={'on' if keyframe_filter else 'off'})")
+    if totals["labelled"]:
+        print(f"accuracy: {totals['correct'] / totals['labelled']:.4f} ({totals['correct']}/{totals['labelled']} labelled videos)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Time to first idea for POST /ai-news, buffered vs streamed (?stream=true).
+
+Upstream is the local OpenAI stand-in (dev_upstreams.py) generating the reply at
+--token-delay seconds per ~4-character chunk after --upstream-delay of latency.
+The response cache is disabled so every request reaches the upstream.
+
+Run from the api folder:
+    python bench_ai_news_ttfb.py --requests 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+UPSTREAM_PORT = 9102
+APP_PORT = 9103
+
+if __name__ == "__main__" or os.getenv("BENCH_AI_NEWS_APP"):
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{UPSTREAM_PORT}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ["LLM_BACKEND"] = "openai"
+    os.environ["LLM_CACHE_TTL"] = "0"
+    os.environ.setdefault("CLERK_JWT_PUBLIC_KEY", "")
+
+import httpx  # noqa: E402
+import requests  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+import ainewsapi  # noqa: E402
+from clerk_auth import get_current_user_id  # noqa: E402
+
+app = FastAPI()
+app.include_router(ainewsapi.router)
+app.dependency_overrides[get_current_user_id] = lambda: "bench-user"
+
+
+def measure(stream, count):
+    """(time to first idea, total time) in ms for each request."""
+    results = []
+    with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60) as client:
+        for i in range(count):
+            body = {"question": f"bench topic {i} {'stream' if stream else 'buffered'}"}
+            start = time.perf_counter()
+            first = None
+            with client.stream("POST", "/ai-news", params={"stream": stream}, json=body) as response:
+                for line in response.iter_lines():
+                    # Buffered: the first idea arrives with the whole body
+                    if first is None and (not stream or line == "event: idea"):
+                        first = time.perf_counter() - start
+            results.append((first * 1000, (time.perf_counter() - start) * 1000))
+    return results
+
+
+def wait_for(url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--upstream-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    args = parser.parse_args()
+
+    env = {**os.environ, "UPSTREAM_DELAY": str(args.upstream_delay),
+           "UPSTREAM_TOKEN_DELAY": str(args.token_delay), "BENCH_AI_NEWS_APP": "1"}
+    uvicorn = [sys.executable, "-m", "uvicorn", "--log-level", "warning"]
+    procs = [
+        subprocess.Popen(uvicorn + ["dev_upstreams:app", "--port", str(UPSTREAM_PORT)], env=env),
+        subprocess.Popen(uvicorn + ["bench_ai_news_ttfb:app", "--port", str(APP_PORT)], env=env),
+    ]
+    try:
+        wait_for(f"http://127.0.0.1:{UPSTREAM_PORT}/_stats")
+        wait_for(f"http://127.0.0.1:{APP_PORT}/docs")
+        print(f"upstream delay={args.upstream_delay}s token delay={args.token_delay}s requests={args.requests}")
+        print(f"{'mode':<12}{'first idea p50 ms':>20}{'total p50 ms':>15}")
+        for name, stream in (("buffered", False), ("stream", True)):
+            results = measure(stream, args.requests)
+            first = statistics.median(r[0] for r in results)
+            total = statistics.median(r[1] for r in results)
+            print(f"{name:<12}{first:>20.1f}{total:>15.1f}")
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
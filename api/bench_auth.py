@@ -0,0 +1,71 @@
+"""
+Per-request cost of get_current_user_id.
+
+Compares the old path (jwt.decode against the PEM string on every call) with the
+pre-parsed key alone and with the verified-token cache, using a freshly generated
+RS256 key and a token re-sent the way the app's polling screens do.
+
+Run from the api folder:
+    python bench_auth.py --iterations 2000
+"""
+import argparse
+import os
+import time
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+PUBLIC_PEM = private_key.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+).decode()
+os.environ["CLERK_JWT_PUBLIC_KEY"] = PUBLIC_PEM.replace("\n", "\\n")
+os.environ.pop("CLERK_JWKS_PATH", None)
+
+from starlette.requests import Request  # noqa: E402
+
+import clerk_auth  # noqa: E402
+
+
+def make_request(token):
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+def old_get_current_user_id(request):
+    token = request.headers.get("Authorization").split(" ")[1]
+    payload = jwt.decode(token, PUBLIC_PEM, algorithms=["RS256"], options={"verify_aud": False}, leeway=10)
+    return payload["sub"]
+
+
+def per_call_us(fn, request, iterations):
+    fn(request)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(request)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = jwt.encode({"sub": "user_bench", "exp": int(time.time()) + 3600}, private_key, algorithm="RS256")
+    request = make_request(token)
+
+    def parsed_key_only(request):
+        clerk_auth.token_cache.clear()
+        return clerk_auth.get_current_user_id(request)
+
+    print(f"{'mode':<28}{'us/request':>12}")
+    for name, fn in (
+        ("pem string (before)", old_get_current_user_id),
+        ("parsed key, no cache", parsed_key_only),
+        ("parsed key + token cache", clerk_auth.get_current_user_id),
+    ):
+        print(f"{name:<28}{per_call_us(fn, request, args.iterations):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
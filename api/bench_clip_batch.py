@@ -0,0 +1,73 @@
+"""
+Compare per-frame and batched CLIP frame classification throughput.
+
+Run from the api folder (same as api.py):
+    python bench_clip_batch.py --frames 64 --batch-sizes 1 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from clip_inference import classify_frames, class_names, get_device
+from model_registry import registry
+
+
+def synthetic_frames(count, width=640, height=360, seed=0):
+    rng = np.random.default_rng(seed)
+    return [Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def per_frame(frames):
+    # The original analyze_video loop: one preprocess + encode_image call per frame
+    clip_model, preprocess, classifier = registry.get("clip")
+    labels = []
+    with torch.no_grad():
+        for frame in frames:
+            image_features = clip_model.encode_image(preprocess(frame).unsqueeze(0).to(get_device())).float()
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            logits = classifier(image_features).softmax(dim=-1)
+            labels.append(class_names[logits.argmax().item()])
+    return labels
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=64, help="Number of synthetic frames")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32])
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads override")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    frames = synthetic_frames(args.frames)
+
+    # Warm-up so lazy initialisation is not counted
+    per_frame(frames[:2])
+
+    baseline, elapsed = timed(per_frame, frames)
+    print(f"device={get_device()} threads={torch.get_num_threads()} frames={len(frames)}")
+    print(f"{'mode':<16}{'seconds':>10}{'frames/sec':>12}{'speedup':>10}")
+    print(f"{'per-frame':<16}{elapsed:>10.3f}{len(frames) / elapsed:>12.2f}{1.0:>10.2f}")
+
+    for batch_size in args.batch_sizes:
+        labels, batched_elapsed = timed(classify_frames, frames, batch_size)
+        agree = sum(a == b for a, b in zip(labels, baseline)) / len(frames)
+        print(
+            f"{'batch=' + str(batch_size):<16}{batched_elapsed:>10.3f}"
+            f"{len(frames) / batched_elapsed:>12.2f}{elapsed / batched_elapsed:>10.2f}"
+            f"   agreement={agree:.2%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
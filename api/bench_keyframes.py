@@ -0,0 +1,102 @@
+"""
+CLIP passes and most_common_action agreement with and without the keyframe filter.
+
+Runs the visual branch on every video of a local sample set twice, both without
+early exit: over all sampled frames, and over the frames KeyframeFilter keeps
+(weighted by the frames each one stands for). Prints per-video frame counts and
+predicted actions, then the total CLIP passes saved and how often the two
+predictions agree.
+--frames-only skips CLIP and just reports what the filter would skip.
+
+Run from the api folder:
+    python bench_keyframes.py ../samples/*.mp4
+    python bench_keyframes.py ../samples --frame-interval 15 --frames-only
+"""
+import argparse
+import os
+import time
+
+from action_aggregator import ActionAggregator
+from clip_inference import check_model_files, class_names, classify_frame_probs, iter_frames
+from keyframes import KeyframeFilter
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm")
+
+
+def video_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def run_frames_only(path, frame_interval):
+    start = time.perf_counter()
+    sampled = sum(1 for _ in iter_frames(path, frame_interval))
+    baseline_seconds = time.perf_counter() - start
+    keyframe_filter = KeyframeFilter()
+    start = time.perf_counter()
+    kept = sum(1 for _ in iter_frames(path, frame_interval, keyframe_filter=keyframe_filter))
+    return sampled, kept, baseline_seconds, time.perf_counter() - start, None, None, keyframe_filter.report()
+
+
+def classify(path, frame_interval, keyframe_filter=None):
+    """(predicted action, frames classified) like POST /analyze, but without early exit."""
+    aggregator = ActionAggregator(class_names)
+    for probs in classify_frame_probs(iter_frames(path, frame_interval, keyframe_filter=keyframe_filter)):
+        aggregator.add(probs)
+    weights = keyframe_filter.weights if keyframe_filter is not None else None
+    return aggregator.predicted_action(weights), aggregator.frame_count
+
+
+def run_clip(path, frame_interval):
+    # Early exit is off in both runs so only the filter makes the difference
+    start = time.perf_counter()
+    action, sampled = classify(path, frame_interval)
+    baseline_seconds = time.perf_counter() - start
+    keyframe_filter = KeyframeFilter()
+    start = time.perf_counter()
+    kept_action, kept = classify(path, frame_interval, keyframe_filter)
+    filtered_seconds = time.perf_counter() - start
+    return sampled, kept, baseline_seconds, filtered_seconds, action, kept_action, keyframe_filter.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="Video files or folders of videos")
+    parser.add_argument("--frame-interval", type=int, default=30)
+    parser.add_argument("--frames-only", action="store_true", help="Do not run CLIP, only count frames")
+    args = parser.parse_args()
+    if not args.frames_only:
+        check_model_files()
+
+    run = run_frames_only if args.frames_only else run_clip
+    print(f"{'video':<32}{'sampled':>8}{'kept':>6}{'added':>7}{'base s':>8}{'filt s':>8}  actions")
+    totals = {"sampled": 0, "kept": 0, "base": 0.0, "filtered": 0.0, "videos": 0, "agree": 0}
+    for path in video_paths(args.paths):
+        sampled, kept, base_s, filt_s, action, kept_action, report = run(path, args.frame_interval)
+        actions = "" if action is None else f"{action} / {kept_action}" + ("" if action == kept_action else "  DIFF")
+        print(f"{os.path.basename(path)[:31]:<32}{sampled:>8}{kept:>6}{report['added_at_cuts']:>7}"
+              f"{base_s:>8.2f}{filt_s:>8.2f}  {actions}")
+        totals["sampled"] += sampled
+        totals["kept"] += kept
+        totals["base"] += base_s
+        totals["filtered"] += filt_s
+        totals["videos"] += 1
+        totals["agree"] += int(action == kept_action)
+
+    if not totals["videos"]:
+        print("No videos found.")
+        return
+    saved = 1 - totals["kept"] / totals["sampled"] if totals["sampled"] else 0.0
+    print(f"\n{totals['videos']} videos: {totals['kept']}/{totals['sampled']} frames classified ({saved:.0%} fewer), "
+          f"{totals['base']:.2f}s -> {totals['filtered']:.2f}s")
+    if not args.frames_only:
+        print(f"most_common_action agreement: {totals['agree']}/{totals['videos']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Mixed read/write load benchmark for the analysis database.
+
+Compares the old connect-per-call access pattern against the pooled WAL
+connections in db.py. Both databases get the same schema from migrations.py
+(including the user/date index), so only the access pattern differs. Uses
+throwaway databases, never analysis.sqlite3.
+
+Run from the api folder:
+    python bench_sqlite.py --threads 8 --ops 2000 --read-ratio 0.9
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_sqlite_")
+os.environ["ANALYSIS_DB_PATH"] = os.path.join(TMP_DIR, "pooled.sqlite3")
+os.environ["ANALYSIS_CACHE_PATH"] = os.path.join(TMP_DIR, "cache.sqlite3")
+
+import analyze_db  # noqa: E402  (must be imported after the env override)
+from db import close_connections  # noqa: E402
+from migrations import MIGRATIONS  # noqa: E402
+
+BASELINE_PATH = os.path.join(TMP_DIR, "baseline.sqlite3")
+USERS = [f"user_{i}" for i in range(50)]
+EXPLANATION = "x" * 2000
+
+
+def baseline_insert(id, user_id):
+    conn = sqlite3.connect(BASELINE_PATH, timeout=5)
+    conn.execute(
+        "INSERT INTO analysis (id, user_id, title, date, result, video_filename, score) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (id, user_id, "Analysis", "2025-06-01", EXPLANATION, "clip.mp4", 50)
+    )
+    conn.commit()
+    conn.close()
+
+
+def baseline_read(user_id):
+    conn = sqlite3.connect(BASELINE_PATH, timeout=5)
+    rows = conn.execute("SELECT id, title, date, result, video_filename FROM analysis WHERE user_id = ?", (user_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def pooled_insert(id, user_id):
+    analyze_db.insert_analysis(id, user_id, "Analysis", "2025-06-01", EXPLANATION, "clip.mp4", 50)
+
+
+def pooled_read(user_id):
+    return analyze_db.get_analyses_for_user(user_id)
+
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY name").fetchall()
+    conn.close()
+    return rows
+
+
+def setup_baseline(seed_rows):
+    # The migrations run on a plain connection, so the file keeps the default rollback journal
+    conn = sqlite3.connect(BASELINE_PATH)
+    for _, _, apply in MIGRATIONS:
+        apply(conn.cursor())
+    conn.commit()
+    conn.close()
+    for _ in range(seed_rows):
+        baseline_insert(str(uuid.uuid4()), random.choice(USERS))
+
+
+def run_load(insert_fn, read_fn, threads, ops, read_ratio):
+    errors = []
+    per_thread = ops // threads
+
+    def worker(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(per_thread):
+                if rng.random() < read_ratio:
+                    read_fn(rng.choice(USERS))
+                else:
+                    insert_fn(str(uuid.uuid4()), rng.choice(USERS))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close_connections()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=2000, help="Total operations per mode")
+    parser.add_argument("--read-ratio", type=float, default=0.9)
+    parser.add_argument("--seed-rows", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_baseline(args.seed_rows)
+    for _ in range(args.seed_rows):
+        pooled_insert(str(uuid.uuid4()), random.choice(USERS))
+    if schema(BASELINE_PATH) != schema(analyze_db.DB_PATH):
+        raise SystemExit("The baseline and pooled databases have different schemas; the comparison would be unfair.")
+
+    print(f"threads={args.threads} ops={args.ops} read_ratio={args.read_ratio} db_dir={TMP_DIR}")
+    print(f"{'mode':<20}{'ops/sec':>12}{'errors':>8}")
+    for name, insert_fn, read_fn in (
+        ("connect-per-call", baseline_insert, baseline_read),
+        ("pooled WAL", pooled_insert, pooled_read),
+    ):
+        ops_per_sec, errors = run_load(insert_fn, read_fn, args.threads, args.ops, args.read_ratio)
+        print(f"{name:<20}{ops_per_sec:>12.1f}{len(errors):>8}")
+        if errors:
+            print(f"  first error: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Time from launching the server to the first answered request, per router.
+
+Starts `uvicorn api:app` and polls one cheap endpoint of every router until it
+answers with any HTTP status (a 401 still shows the router is serving). /ready is
+also timed until it returns 200, i.e. until CLIP and Whisper are loaded.
+
+--preload imports torch, clip and whisper before the app, the way analyzeapi used
+to at import time, to compare against the deferred imports.
+
+Run from the api folder:
+    python bench_startup.py
+    python bench_startup.py --warmup lazy --preload
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+PORT = 9104
+PROBES = [
+    ("trends", "GET", "/trends"),
+    ("ainews", "POST", "/ai-news"),
+    ("analyze", "GET", "/analyze/history"),
+    ("analyze_db", "POST", "/delete_all_analyses"),
+    ("analysis_cache", "GET", "/analysis-cache/stats"),
+    ("llm_gateway", "GET", "/llm/stats"),
+    ("model_registry", "GET", "/ready"),
+]
+PRELOAD = "import torch, clip, whisper, cv2"
+
+
+async def first_response(client, method, path, start, deadline, want_status=None):
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.request(method, path)
+            if want_status is None or response.status_code == want_status:
+                return time.perf_counter() - start, response.status_code
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.02)
+    return None, None
+
+
+async def probe_all(start, timeout):
+    deadline = start + timeout
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=5) as client:
+        tasks = [first_response(client, method, path, start, deadline) for _, method, path in PROBES]
+        tasks.append(first_response(client, "GET", "/ready", start, deadline, want_status=200))
+        return await asyncio.gather(*tasks)
+
+
+def run(warmup, preload, timeout):
+    env = {**os.environ, "MODEL_WARMUP": warmup}
+    env.setdefault("CLERK_JWT_PUBLIC_KEY", "")
+    code = f"import uvicorn; uvicorn.run('api:app', port={PORT}, log_level='warning')"
+    if preload:
+        code = f"{PRELOAD}; {code}"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", code], env=env)
+    try:
+        return asyncio.run(probe_all(start, timeout))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--warmup", choices=["eager", "lazy"], default="eager", help="MODEL_WARMUP for the server")
+    parser.add_argument("--preload", action="store_true", help="Also run with the heavy imports done up front")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for each endpoint")
+    args = parser.parse_args()
+
+    modes = [("deferred", False)] + ([("preloaded", True)] if args.preload else [])
+    results = {name: run(args.warmup, preload, args.timeout) for name, preload in modes}
+
+    print(f"MODEL_WARMUP={args.warmup}; seconds from launch to first answer (status)")
+    print(f"{'router':<16}{'path':<24}" + "".join(f"{name:>18}" for name, _ in modes))
+    rows = [(name, path) for name, _, path in PROBES] + [("models loaded", "/ready == 200")]
+    for i, (name, path) in enumerate(rows):
+        cells = []
+        for mode, _ in modes:
+            seconds, status = results[mode][i]
+            cells.append(f"{seconds:.2f}s ({status})" if seconds is not None else "timeout")
+        print(f"{name:<16}{path:<24}" + "".join(f"{cell:>18}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
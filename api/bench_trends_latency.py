@@ -0,0 +1,126 @@
+"""
+Latency of a cheap endpoint while /trend-growth calls are in flight.
+
+Compares the old blocking requests.get inside an async endpoint with the pooled
+async client now used by trendsapi. Upstream is the local stand-in
+(dev_upstreams.py) with UPSTREAM_DELAY of latency, and the headline cache is
+disabled so every trend call goes upstream.
+
+Run from the api folder:
+    python bench_trends_latency.py --trend-concurrency 8 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+UPSTREAM_PORT = 9100
+APP_PORT = 9101
+
+if __name__ == "__main__" or os.getenv("BENCH_TRENDS_APP"):
+    os.environ.setdefault("NEWSAPI_BASE_URL", f"http://127.0.0.1:{UPSTREAM_PORT}")
+    os.environ["NEWS_CACHE_TTL"] = "0"
+    os.environ["NEWS_STALE_TTL"] = "0"
+    # trendsapi imports clerk_auth; /trend-growth itself is unauthenticated
+    os.environ.setdefault("CLERK_JWT_PUBLIC_KEY", "")
+
+import httpx  # noqa: E402
+import requests  # noqa: E402
+from fastapi import FastAPI, HTTPException  # noqa: E402
+
+import trendsapi  # noqa: E402
+
+app = FastAPI()
+app.include_router(trendsapi.router)
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+@app.get("/trend-growth-blocking")
+async def trend_growth_blocking(id: int):
+    # The pre-change implementation: a blocking call on the event loop
+    url = f"{trendsapi.NEWSAPI_BASE_URL}/v2/top-headlines?language=en&pageSize=50"
+    response = requests.get(url, headers={"Authorization": trendsapi.NEWSAPI_KEY})
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Failed to fetch news trends")
+    return {"articles": len(response.json().get("articles", []))}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def measure(trend_path, trend_concurrency, seconds):
+    base = f"http://127.0.0.1:{APP_PORT}"
+    stop = asyncio.Event()
+    trend_calls = 0
+
+    async with httpx.AsyncClient(base_url=base, timeout=60) as client:
+        async def trend_worker():
+            nonlocal trend_calls
+            while not stop.is_set():
+                await client.get(trend_path, params={"id": 1})
+                trend_calls += 1
+
+        workers = [asyncio.create_task(trend_worker()) for _ in range(trend_concurrency)]
+        await asyncio.sleep(0.5)
+        latencies = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await client.get("/ping")
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.01)
+        stop.set()
+        await asyncio.gather(*workers)
+    return latencies, trend_calls
+
+
+def wait_for(url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trend-concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10, help="How long to send pings per mode")
+    parser.add_argument("--upstream-delay", type=float, default=0.3)
+    args = parser.parse_args()
+
+    env = {**os.environ, "UPSTREAM_DELAY": str(args.upstream_delay), "BENCH_TRENDS_APP": "1"}
+    uvicorn = [sys.executable, "-m", "uvicorn", "--log-level", "warning"]
+    procs = [
+        subprocess.Popen(uvicorn + ["dev_upstreams:app", "--port", str(UPSTREAM_PORT)], env=env),
+        subprocess.Popen(uvicorn + ["bench_trends_latency:app", "--port", str(APP_PORT)], env=env),
+    ]
+    try:
+        wait_for(f"http://127.0.0.1:{UPSTREAM_PORT}/_stats")
+        wait_for(f"http://127.0.0.1:{APP_PORT}/ping")
+        print(f"upstream delay={args.upstream_delay}s trend concurrency={args.trend_concurrency}")
+        print(f"{'mode':<12}{'pings':>8}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'trend calls':>13}")
+        for name, path in (("blocking", "/trend-growth-blocking"), ("async", "/trend-growth")):
+            latencies, trend_calls = asyncio.run(measure(path, args.trend_concurrency, args.seconds))
+            print(
+                f"{name:<12}{len(latencies):>8}{percentile(latencies, 50):>10.1f}{percentile(latencies, 99):>10.1f}"
+                f"{statistics.mean(latencies):>10.1f}{trend_calls:>13}"
+            )
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
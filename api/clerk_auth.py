@@ -1,28 +1,161 @@
 from fastapi import Depends, HTTPException, status, Request
 import jwt
 from dotenv import load_dotenv
+from collections import OrderedDict
+from cryptography.hazmat.primitives.serialization import load_pem_public_key
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
 
 load_dotenv()
-CLERK_JWT_PUBLIC_KEY = os.getenv("CLERK_JWT_PUBLIC_KEY").replace("\\n", "\n")
+CLERK_JWT_PUBLIC_KEY = (os.getenv("CLERK_JWT_PUBLIC_KEY") or "").replace("\\n", "\n")
+# Optional JWKS file ({"keys": [...]}) for key rotation; tokens pick their key by "kid"
+CLERK_JWKS_PATH = os.getenv("CLERK_JWKS_PATH", "")
+CLERK_JWKS_RELOAD_SECONDS = float(os.getenv("CLERK_JWKS_RELOAD_SECONDS", "30"))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))
+JWT_LEEWAY = 10  # allow 10 seconds clock skew
+
+def load_public_key(pem):
+    """Parse the PEM once; jwt.decode would otherwise parse it again for every request."""
+    if not pem.strip():
+        return None
+    return load_pem_public_key(pem.encode("utf-8"))
+
+public_key = load_public_key(CLERK_JWT_PUBLIC_KEY)
+
+class JWKSFile:
+    """Signing keys from a local JWKS file, reloaded when the file changes.
+
+    The file is checked at most every reload_seconds, so rotating keys only needs
+    the new file written in place; no restart.
+    """
+
+    def __init__(self, path, reload_seconds=CLERK_JWKS_RELOAD_SECONDS, on_reload=None):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self.on_reload = on_reload
+        self.keys = {}  # kid -> key object
+        self._mtime = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self, kid):
+        self.maybe_reload()
+        return self.keys.get(kid)
+
+    def maybe_reload(self):
+        """Reload the keys if the file changed; at most one check every reload_seconds."""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_seconds:
+            return
+        with self._lock:
+            if now - self._checked_at < self.reload_seconds:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+                if mtime == self._mtime:
+                    return
+                with open(self.path) as f:
+                    jwks = jwt.PyJWKSet.from_dict(json.load(f))
+            except Exception as e:
+                # Keep the keys we have; a half-written file must not log everyone out
+                logging.error(f"Could not load JWKS from {self.path}: {e}")
+                return
+            self.keys = {key.key_id: key.key for key in jwks.keys}
+            self._mtime = mtime
+            logging.info(f"Loaded {len(self.keys)} signing keys from {self.path}")
+            if self.on_reload:
+                self.on_reload()
+
+class VerifiedTokenCache:
+    """Bounded LRU of token hash -> (sub, exp) for tokens that already passed verification.
+
+    The app's polling screens send the same token many times, so each token is
+    verified once and then trusted until it expires.
+    """
+
+    def __init__(self, max_entries=AUTH_TOKEN_CACHE_SIZE, clock=time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(token):
+        # Keep digests rather than bearer tokens in memory
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() < entry[1]:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, token, sub, exp):
+        if self.max_entries <= 0 or exp is None:
+            return
+        with self._lock:
+            self._entries[self.key(token)] = (sub, exp)
+            self._entries.move_to_end(self.key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_cache = VerifiedTokenCache()
+# Tokens verified with a key that was rotated out must not stay trusted
+jwks = JWKSFile(CLERK_JWKS_PATH, on_reload=token_cache.clear) if CLERK_JWKS_PATH else None
+
+def signing_key(token):
+    """The key for this token: the JWKS key named by its "kid", else CLERK_JWT_PUBLIC_KEY."""
+    if jwks is not None:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = jwks.get(kid) if kid else None
+        if key is not None:
+            return key
+    if public_key is None:
+        raise jwt.InvalidKeyError("No signing key configured for this token")
+    return public_key
+
+def verify_token(token):
+    """Return the user id (sub) of a valid token, raising a jwt error otherwise."""
+    if jwks is not None:
+        # A rotation clears the cache (on_reload), so it must be noticed before a cache hit
+        jwks.maybe_reload()
+    sub = token_cache.get(token)
+    if sub is not None:
+        return sub
+    payload = jwt.decode(
+        token,
+        signing_key(token),
+        algorithms=["RS256"],
+        options={"verify_aud": False},
+        leeway=JWT_LEEWAY
+    )
+    token_cache.put(token, payload["sub"], payload.get("exp"))
+    return payload["sub"]
 
 def get_current_user_id(request: Request):
     auth = request.headers.get("Authorization")
-    # print("Authorization header:", auth)  # Add this line
     if not auth or not auth.startswith("Bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing or invalid Authorization header")
     token = auth.split(" ")[1]
     try:
-        # print("Using public key:", CLERK_JWT_PUBLIC_KEY)
-        # print("JWT header:", jwt.get_unverified_header(token))
-        payload = jwt.decode(
-            token,
-            CLERK_JWT_PUBLIC_KEY,
-            algorithms=["RS256"],
-            options={"verify_aud": False},
-            leeway=10  # allow 10 seconds clock skew
-        )
-        return payload["sub"] 
+        return verify_token(token)
     except Exception as e:
-        print("JWT decode error:", e)  # Add this line
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
\ No newline at end of file
+        logging.warning(f"JWT decode error: {e}")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
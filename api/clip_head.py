@@ -0,0 +1,34 @@
+import torch
+from torch import nn
+
+from clip_inference import CLIP_BACKBONE
+
+def text_head(text_features, logit_scale):
+    """Zero-shot classifier as an nn.Linear: logits = logit_scale * image_features @ text_features.T."""
+    head = nn.Linear(text_features.shape[1], text_features.shape[0], device=text_features.device)
+    with torch.no_grad():
+        head.weight.copy_(logit_scale * text_features)
+        head.bias.zero_()
+    return head.eval()
+
+def load_head(path, class_names, device):
+    """Load a linear head trained on frozen, L2-normalized stock CLIP image features.
+
+    The file is a dict with "backbone", "classes", "weight" (classes x dim) and "bias".
+    Its rows are reordered to class_names; the head must cover exactly those classes.
+    """
+    artifact = torch.load(path, map_location=device, weights_only=True)
+    if artifact.get("backbone") != CLIP_BACKBONE:
+        raise ValueError(f"{path} was trained on {artifact.get('backbone')!r}, expected {CLIP_BACKBONE!r}")
+    head_classes = list(artifact["classes"])
+    if sorted(head_classes) != sorted(class_names):
+        missing = sorted(set(class_names) - set(head_classes))
+        extra = sorted(set(head_classes) - set(class_names))
+        raise ValueError(f"{path} does not match the class list (missing {missing}, extra {extra})")
+    order = torch.tensor([head_classes.index(name) for name in class_names], device=device)
+    weight = artifact["weight"].float()[order]
+    head = nn.Linear(weight.shape[1], weight.shape[0], device=device)
+    with torch.no_grad():
+        head.weight.copy_(weight)
+        head.bias.copy_(artifact["bias"].float()[order])
+    return head.eval()
@@ -0,0 +1,308 @@
+"""CLIP action classification and frame sampling, shared by the API and the offline tools.
+
+Importing this module has no side effects beyond registering the "clip" loader: no
+database, no API keys, no executors. torch, clip and cv2 are imported inside the
+functions that use them.
+"""
+import os
+import logging
+import json
+import hashlib
+import math
+import uuid
+import functools
+from itertools import islice
+
+from model_registry import registry
+
+@functools.lru_cache(maxsize=None)
+def get_device():
+    import torch
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    logging.info(f"Using device: {device}")
+    return device
+
+# CLIP architecture; the fine-tuned weights and CLIP_HEAD_PATH heads are trained on it
+CLIP_BACKBONE = "ViT-B/32"
+# Fine-tuned CLIP weights
+model_path = "../fine_tuned_clip.pth"
+
+# CLIP inference precision: fp32, bf16, or int8 (dynamic quantization of the linear layers, CPU only).
+# int8 loads the weights written by `python export_clip.py` when present, else quantizes at load time.
+CLIP_PRECISION = os.getenv("CLIP_PRECISION", "fp32").lower()
+CLIP_INT8_PATH = os.getenv("CLIP_INT8_PATH", "../fine_tuned_clip.int8.pth")
+# Linear head written by `python data/train.py --mode head`. When set, it classifies the
+# features of stock CLIP and the fine-tuned weights are not needed.
+CLIP_HEAD_PATH = os.getenv("CLIP_HEAD_PATH", "")
+
+def check_model_files():
+    """Raise FileNotFoundError unless the weights load_clip needs for the current settings exist."""
+    if CLIP_HEAD_PATH:
+        if not os.path.exists(CLIP_HEAD_PATH):
+            logging.error(f"CLIP head not found: {CLIP_HEAD_PATH}")
+            raise FileNotFoundError(f"CLIP head file not found at {CLIP_HEAD_PATH}")
+    elif not os.path.exists(model_path) and not (CLIP_PRECISION == "int8" and os.path.exists(CLIP_INT8_PATH)):
+        logging.error(f"Model path not found: {model_path}")
+        raise FileNotFoundError(f"Model file not found at {model_path}")
+
+# Class names
+class_names = [
+    "skateboarding", "guitar playing", "cooking", "playing piano", "soccer juggling",
+    "basketball dunk", "yoga", "weightlifting", "running", "biking", "swimming", "surfing",
+    "boxing", "dancing", "karate", "walking a dog", "fishing", "skiing", "snowboarding",
+    "playing drums", "parkour", "typing on a keyboard", "playing violin", "jump rope", "tennis serve"
+]
+
+# Number of frames encoded per CLIP forward pass
+CLIP_BATCH_SIZE = int(os.getenv("CLIP_BATCH_SIZE", "16"))
+
+# Frame sampling: gaps longer than this many frames are skipped with a seek instead of grab()
+FRAME_SEEK_THRESHOLD = int(os.getenv("FRAME_SEEK_THRESHOLD", "120"))
+# Drop near-duplicate frames and add frames at scene cuts before CLIP (see keyframes.py)
+KEYFRAME_FILTER = os.getenv("KEYFRAME_FILTER", "1").lower() not in ("0", "false", "no")
+
+
+# Text prompts never change between requests, so their embeddings are computed once.
+# Set TEXT_EMBEDDING_CACHE_DIR to an empty string to keep them in memory only.
+PROMPT_TEMPLATE = "a photo of a person doing {}"
+TEXT_EMBEDDING_CACHE_DIR = os.getenv("TEXT_EMBEDDING_CACHE_DIR", "../.cache/text_embeddings")
+
+def weights_fingerprint(path):
+    """Identify a weights file by path, size and mtime; hashing 600 MB of weights would cost a full read."""
+    st = os.stat(path)
+    payload = f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def text_embedding_key(weights_hash, template=PROMPT_TEMPLATE, names=class_names, precision=CLIP_PRECISION):
+    """Cache key for the class-name embeddings: changes with the weights, template, class list or precision."""
+    payload = {"weights": weights_hash, "template": template, "classes": list(names)}
+    if precision != "fp32":
+        # Only added for the reduced precisions so existing fp32 cache files stay valid
+        payload["precision"] = precision
+    payload = json.dumps(payload)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def compute_text_embeddings(model, template=PROMPT_TEMPLATE, names=class_names):
+    """Encode one prompt per class name and L2-normalize the result."""
+    import clip
+    import torch
+    with torch.no_grad():
+        text_inputs = torch.cat([clip.tokenize(template.format(c)) for c in names]).to(get_device())
+        text_features = model.encode_text(text_inputs).float()
+    return text_features / text_features.norm(dim=-1, keepdim=True)
+
+def load_text_embeddings(model, weights_path, cache_dir=TEXT_EMBEDDING_CACHE_DIR):
+    import torch
+    key = text_embedding_key(weights_fingerprint(weights_path))
+    cache_path = os.path.join(cache_dir, f"{key}.pt") if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        try:
+            text_features = torch.load(cache_path, map_location=get_device())
+            logging.info(f"Loaded cached text embeddings from {cache_path}")
+            return text_features
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable text embedding cache {cache_path}: {e}")
+
+    text_features = compute_text_embeddings(model)
+    logging.info(f"Computed text embeddings for {len(class_names)} classes (key {key}).")
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+            torch.save(text_features.cpu(), tmp_path)
+            os.replace(tmp_path, cache_path)
+            logging.info(f"Saved text embeddings to {cache_path}")
+        except OSError as e:
+            logging.warning(f"Could not save text embeddings to {cache_path}: {e}")
+    return text_features
+
+def clip_weights_path():
+    """The weights file load_clip reads for the current settings (the head on stock CLIP, if set)."""
+    if CLIP_HEAD_PATH:
+        return CLIP_HEAD_PATH
+    if CLIP_PRECISION == "int8" and os.path.exists(CLIP_INT8_PATH):
+        return CLIP_INT8_PATH
+    return model_path
+
+@functools.lru_cache(maxsize=None)
+def clip_model_identity():
+    """Names the classifier that produces the actions: backbone, precision and weights.
+
+    load_clip loads exactly this model and cached visual results are keyed by it, so
+    retrained weights or a change of any setting are never answered from results of the
+    previous model. Computed once per process, like the model itself.
+    """
+    return (f"clip={CLIP_BACKBONE};precision={CLIP_PRECISION}"
+            f";weights={weights_fingerprint(clip_weights_path())[:12]}")
+
+def load_clip():
+    """Load CLIP and its class scoring layer as (model, preprocess, classifier).
+
+    classifier is an nn.Linear from normalized image features to class logits: the
+    CLIP_HEAD_PATH head on stock CLIP, or the class-name embeddings of the fine-tuned model.
+    """
+    import clip
+    import torch
+    from clip_precision import PRECISIONS, apply_precision, quantize_int8
+    from clip_head import load_head, text_head
+    device = get_device()
+    if CLIP_PRECISION not in PRECISIONS:
+        raise ValueError(f"CLIP_PRECISION must be one of {PRECISIONS}, got {CLIP_PRECISION!r}")
+    if CLIP_PRECISION == "int8" and device.type != "cpu":
+        raise ValueError("CLIP_PRECISION=int8 runs on the CPU only; use fp32 or bf16 on CUDA.")
+    try:
+        clip_model, preprocess = clip.load(CLIP_BACKBONE, device=device)
+        logging.info("Original CLIP model loaded.")
+        if CLIP_HEAD_PATH:
+            clip_model = apply_precision(clip_model, CLIP_PRECISION)
+            classifier = load_head(CLIP_HEAD_PATH, class_names, device)
+            logging.info(f"Stock CLIP with the linear head from {CLIP_HEAD_PATH} ({clip_model_identity()}).")
+            return clip_model, preprocess, classifier
+        weights_path = clip_weights_path()
+        if weights_path == CLIP_INT8_PATH:
+            # The exported int8 state dict only fits the quantized module structure
+            clip_model = quantize_int8(clip_model.eval())
+            clip_model.load_state_dict(torch.load(CLIP_INT8_PATH, map_location=device))
+        else:
+            # mmap maps the file instead of reading it into memory; on CPU, assign=True then
+            # uses those pages as the parameters directly instead of copying them
+            state_dict = torch.load(model_path, map_location=device, mmap=True, weights_only=True)
+            clip_model.load_state_dict(state_dict, assign=device.type == "cpu")
+            clip_model = apply_precision(clip_model.to(device), CLIP_PRECISION)
+        clip_model.eval()
+        logging.info(f"Fine-tuned CLIP weights loaded from {weights_path} ({clip_model_identity()}) and model set to eval mode.")
+    except Exception as e:
+        logging.error(f"Failed to load CLIP model or weights: {e}")
+        raise e
+    text_features = load_text_embeddings(clip_model, weights_path)
+    return clip_model, preprocess, text_head(text_features, clip_model.logit_scale.exp().float())
+
+registry.register("clip", load_clip)
+
+def classify_frame_probs(frames, batch_size=CLIP_BATCH_SIZE):
+    """Yield a (batch, classes) numpy array of CLIP class probabilities per batch of frames.
+
+    frames can be a list or a generator such as iter_frames; only one batch is held in
+    memory, and no frame is decoded before the consumer asks for its batch.
+    """
+    import torch
+    model, preprocess_fn, classifier = registry.get("clip")
+    device = get_device()
+    frames = iter(frames)
+    with torch.no_grad():
+        while True:
+            chunk = list(islice(frames, batch_size))
+            if not chunk:
+                break
+            batch = torch.stack([preprocess_fn(frame) for frame in chunk]).to(device)
+            image_features = model.encode_image(batch).float()
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+            yield classifier(image_features).softmax(dim=-1).cpu().numpy()
+
+def classify_frames(frames, batch_size=CLIP_BATCH_SIZE):
+    """Classify frames with CLIP in fixed-size batches and return one label per frame."""
+    labels = []
+    for probs in classify_frame_probs(frames, batch_size):
+        labels.extend(class_names[idx] for idx in probs.argmax(axis=-1).tolist())
+    return labels
+
+def sample_frame_indices(total_frames, native_fps, frame_interval=30, sample_fps=None, num_frames=None):
+    """Frame indices to decode, in increasing order.
+
+    num_frames picks K evenly spaced frames, sample_fps picks N frames per second of video,
+    otherwise every frame_interval-th frame is used.
+    """
+    if total_frames <= 0:
+        return []
+    if num_frames:
+        count = min(num_frames, total_frames)
+        step = total_frames / count
+        return [int(step * i + step / 2) for i in range(count)]
+    if sample_fps and native_fps > 0:
+        step = max(native_fps / sample_fps, 1.0)
+        return [int(step * i) for i in range(math.ceil(total_frames / step))]
+    return list(range(0, total_frames, max(frame_interval, 1)))
+
+def iter_frames(video_path, frame_interval=30, sample_fps=None, num_frames=None, keyframe_filter=None):
+    """Yield sampled frames as PIL images, decoding only the frames that are kept.
+
+    Short gaps are skipped with grab(), which avoids the colour conversion of skipped
+    frames; gaps longer than FRAME_SEEK_THRESHOLD seek straight to the next target.
+    With a keyframe_filter, each sample (plus the frame halfway through the gap before
+    it, when that gap is walked with grab()) goes through the filter and only the
+    frames it keeps are yielded.
+    """
+    import cv2
+    from PIL import Image
+
+    def to_pil(image):
+        return Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+    def emit(image, between=None):
+        if keyframe_filter is None:
+            return [to_pil(image)]
+        return [to_pil(kept) for kept in keyframe_filter.feed(image, between)]
+
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        native_fps = cap.get(cv2.CAP_PROP_FPS)
+        if total_frames <= 0:
+            # Container does not report a frame count: fall back to a sequential scan
+            logging.warning(f"Unknown frame count for {video_path}, sampling every {frame_interval} frames.")
+            index = 0
+            while cap.grab():
+                if index % max(frame_interval, 1) == 0:
+                    success, image = cap.retrieve()
+                    if success:
+                        yield from emit(image)
+                index += 1
+            return
+
+        position = 0  # index of the next frame the decoder will return
+        for target in sample_frame_indices(total_frames, native_fps, frame_interval, sample_fps, num_frames):
+            between = None
+            if target - position > FRAME_SEEK_THRESHOLD:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                position = target
+            # The filter gets the frame halfway through the gap in case a cut hides a short shot there
+            midpoint = (position + target) // 2 if keyframe_filter is not None and target - position > 1 else None
+            while position < target:
+                if not cap.grab():
+                    return
+                if position == midpoint:
+                    success, image = cap.retrieve()
+                    between = image if success else None
+                position += 1
+            success, image = cap.read()
+            if not success:
+                return
+            position += 1
+            yield from emit(image, between)
+    finally:
+        cap.release()
+
+def planned_sample_count(video_path, frame_interval=30, sample_fps=None, num_frames=None):
+    """How many frames iter_frames will sample (0 when the container reports no frame count)."""
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        native_fps = cap.get(cv2.CAP_PROP_FPS)
+    finally:
+        cap.release()
+    return len(sample_frame_indices(total_frames, native_fps, frame_interval, sample_fps, num_frames))
+
+def get_video_length(video_path):
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return 0
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    cap.release()
+    if fps > 0:
+        duration = frame_count / fps
+    else:
+        duration = 0
+    return duration  # duration in seconds
@@ -0,0 +1,54 @@
+import os
+import torch
+from torch import nn
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+def convert_weights_bf16(model):
+    """Cast the matmul weights to bfloat16, the way clip.model.convert_weights does for fp16.
+
+    LayerNorm and the embeddings stay in fp32; CLIP's own LayerNorm computes in fp32
+    and casts back, so activations flow through the network in bf16.
+    """
+    def to_bf16(layer):
+        if isinstance(layer, (nn.Conv1d, nn.Conv2d, nn.Linear)):
+            layer.weight.data = layer.weight.data.to(torch.bfloat16)
+            if layer.bias is not None:
+                layer.bias.data = layer.bias.data.to(torch.bfloat16)
+        if isinstance(layer, nn.MultiheadAttention):
+            for attr in ["in_proj_weight", "q_proj_weight", "k_proj_weight", "v_proj_weight",
+                         "in_proj_bias", "bias_k", "bias_v"]:
+                tensor = getattr(layer, attr)
+                if tensor is not None:
+                    tensor.data = tensor.data.to(torch.bfloat16)
+        for name in ["text_projection", "proj"]:
+            attr = getattr(layer, name, None)
+            if isinstance(attr, torch.Tensor):
+                attr.data = attr.data.to(torch.bfloat16)
+
+    model.apply(to_bf16)
+    return model
+
+def quantize_int8(model):
+    """Dynamic INT8 quantization of the nn.Linear layers (CPU only).
+
+    Weights are stored as int8 and activations quantized per batch, so no calibration
+    data is needed. The transformer MLPs, which hold most of the weights and FLOPs, are
+    quantized; attention's fused in-projection stays in fp32.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+def apply_precision(model, precision):
+    """Return model (eval mode) converted to one of PRECISIONS; fp32 leaves it as clip.load built it."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+    model.eval()
+    if precision == "bf16":
+        return convert_weights_bf16(model)
+    if precision == "int8":
+        return quantize_int8(model)
+    return model
+
+def int8_weights_path(weights_path):
+    root, ext = os.path.splitext(weights_path)
+    return f"{root}.int8{ext}"
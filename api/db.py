@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Threads used by run_db for database work coming from async code
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# WAL lets readers run while a write is in progress; NORMAL sync is durable in WAL mode
+# except for the last transactions on power loss, which is fine for analysis history.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+_local = threading.local()
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="sqlite")
+
+def get_connection(path):
+    """Return this thread's connection to path, opening and configuring it on first use."""
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        connections[path] = conn
+        logging.debug(f"Opened SQLite connection to {path} on {threading.current_thread().name}")
+    return conn
+
+@contextmanager
+def transaction(path):
+    """Yield a cursor on the thread's pooled connection; commit on success, roll back on error."""
+    conn = get_connection(path)
+    c = conn.cursor()
+    try:
+        yield c
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        c.close()
+
+def close_connections():
+    """Close the calling thread's connections (used by scripts and tests)."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+async def run_db(fn, *args):
+    """Run a blocking database function on the DB thread pool without blocking the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, fn, *args)
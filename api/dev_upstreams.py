@@ -0,0 +1,146 @@
+"""
+Local stand-in for NewsAPI and the OpenAI chat completions API.
+
+Lets the trends and AI news endpoints run (and be load tested) without API keys:
+    uvicorn dev_upstreams:app --port 9000
+    NEWSAPI_BASE_URL=http://localhost:9000 OPENAI_BASE_URL=http://localhost:9000/v1 python api.py
+
+UPSTREAM_DELAY adds artificial latency (seconds) to every call, and
+UPSTREAM_TOKEN_DELAY the time to generate each chat completion chunk of about
+four characters, streamed ("stream": true) or not. GET /_stats shows
+how many times each upstream was hit, which is how cache behaviour is checked.
+
+POST /_faults makes the next calls misbehave, to exercise retries and timeouts:
+    {"times": 2, "status": 429, "retry_after": "1"}  # answer 429 with Retry-After twice
+    {"times": 1, "delay": 5}                          # answer only after 5 more seconds
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+UPSTREAM_DELAY = float(os.getenv("UPSTREAM_DELAY", "0.2"))
+UPSTREAM_TOKEN_DELAY = float(os.getenv("UPSTREAM_TOKEN_DELAY", "0"))
+CHUNK_CHARS = 4
+
+app = FastAPI()
+calls = {"top-headlines": 0, "chat-completions": 0}
+faults = {"times": 0, "status": None, "retry_after": None, "delay": 0.0}
+
+TOPICS = [
+    "Quantum computer breaks encryption record", "Local team wins championship final",
+    "New museum exhibit celebrates modern art", "Scientists discover water on distant moon",
+    "Startup unveils foldable laptop", "Marathon runner sets world record",
+    "AI model composes symphony", "Electric car sales hit new high",
+    "Researchers map the deep ocean floor", "Street artist mural goes viral",
+]
+
+def fake_articles(count):
+    now = datetime.utcnow()
+    return [
+        {
+            "title": f"{TOPICS[i % len(TOPICS)]} ({i + 1})",
+            "description": f"Summary of story {i + 1}.",
+            "content": f"Full details of story {i + 1}.",
+            "urlToImage": f"https://example.com/image/{i + 1}.jpg",
+            "publishedAt": (now - timedelta(hours=11 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        for i in range(count)
+    ]
+
+def fake_reply(prompt):
+    """Answer in the shape each of the app's prompts asks for."""
+    if "Categorize the following news articles" in prompt:
+        titles = re.findall(r"^\d+\. Title: (.*)$", prompt, flags=re.MULTILINE)
+        categories = ["Tech", "Science", "Art", "Sports"]
+        return json.dumps([
+            {"id": i + 1, "category": categories[i % 4], "title": title, "summary": "Summary.",
+             "details": "Details.", "image": f"https://example.com/image/{i + 1}.jpg"}
+            for i, title in enumerate(titles)
+        ])
+    if "clickbait" in prompt:
+        return json.dumps([
+            {"title": f"You Won't Believe Idea #{i}!", "description": f"Clickbait idea number {i}."}
+            for i in range(1, 4)
+        ])
+    return json.dumps({"score": 72, "explanation": "### Analysis Result:\n\n1. **Music: 14/20** - Fake upstream."})
+
+async def injected_fault():
+    """The error response for this call while POST /_faults is in effect, else None."""
+    if faults["times"] <= 0:
+        return None
+    faults["times"] -= 1
+    await asyncio.sleep(faults["delay"])
+    if faults["status"] is None:
+        return None
+    headers = {"Retry-After": str(faults["retry_after"])} if faults["retry_after"] is not None else None
+    return JSONResponse(status_code=faults["status"], content={"error": "injected fault"}, headers=headers)
+
+@app.get("/v2/top-headlines")
+async def top_headlines(pageSize: int = 20):
+    calls["top-headlines"] += 1
+    fault = await injected_fault()
+    if fault is not None:
+        return fault
+    await asyncio.sleep(UPSTREAM_DELAY)
+    articles = fake_articles(pageSize)
+    return {"status": "ok", "totalResults": len(articles), "articles": articles}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    calls["chat-completions"] += 1
+    fault = await injected_fault()
+    if fault is not None:
+        return fault
+    body = await request.json()
+    await asyncio.sleep(UPSTREAM_DELAY)
+    prompt = body["messages"][-1]["content"]
+    content = fake_reply(prompt)
+    completion_id = f"chatcmpl-fake-{calls['chat-completions']}"
+    usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+             "total_tokens": (len(prompt) + len(content)) // 4}
+    if body.get("stream"):
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        return StreamingResponse(
+            stream_chunks(completion_id, body.get("model", "gpt-4o"), content, usage if include_usage else None),
+            media_type="text/event-stream",
+        )
+    await asyncio.sleep(UPSTREAM_TOKEN_DELAY * -(-len(content) // CHUNK_CHARS))
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+async def stream_chunks(completion_id, model, content, usage):
+    def chunk(choices, usage=None):
+        payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": model, "choices": choices, "usage": usage}
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+    for i in range(0, len(content), CHUNK_CHARS):
+        await asyncio.sleep(UPSTREAM_TOKEN_DELAY)
+        yield chunk([{"index": 0, "delta": {"content": content[i:i + CHUNK_CHARS]}, "finish_reason": None}])
+    yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+    if usage is not None:
+        yield chunk([], usage)
+    yield "data: [DONE]\n\n"
+
+@app.get("/_stats")
+def stats():
+    return calls
+
+@app.post("/_faults")
+async def set_faults(request: Request):
+    body = await request.json()
+    faults.update(times=int(body.get("times", 1)), status=body.get("status"),
+                  retry_after=body.get("retry_after"), delay=float(body.get("delay", 0)))
+    return faults
@@ -0,0 +1,109 @@
+"""
+Export the fine-tuned CLIP weights for CLIP_PRECISION=int8 and check what each
+precision costs in accuracy.
+
+The export quantizes the linear layers of ../fine_tuned_clip.pth to int8 and
+writes the state dict next to it (../fine_tuned_clip.int8.pth), which
+clip_inference loads instead of the fp32 file. --check runs validate_clip from
+data/train.py on the val split for fp32, bf16 and int8 and prints accuracy next
+to CPU images/sec.
+
+Run from the api folder:
+    python export_clip.py
+    python export_clip.py --check --val-dir ../data/split/val --limit 1000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import clip
+import torch
+from torch.utils.data import DataLoader, Subset
+
+from clip_inference import CLIP_BACKBONE
+from clip_precision import PRECISIONS, apply_precision, int8_weights_path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+from train import FrameDataset, validate_clip  # noqa: E402
+
+DEVICE = "cpu"
+
+
+def load_model(weights_path, precision):
+    model, preprocess = clip.load(CLIP_BACKBONE, device=DEVICE)
+    model.load_state_dict(torch.load(weights_path, map_location=DEVICE))
+    return apply_precision(model, precision), preprocess
+
+
+def state_dict_mb(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1e6
+
+
+def export_int8(weights_path, out_path):
+    model, _ = load_model(weights_path, "int8")
+    tmp_path = f"{out_path}.tmp"
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, out_path)
+    print(f"wrote {out_path}: {os.path.getsize(out_path) / 1e6:.1f} MB (fp32 {os.path.getsize(weights_path) / 1e6:.1f} MB)")
+
+
+def val_loader(val_dir, preprocess, limit, batch_size, workers):
+    class_names = sorted(
+        d for d in os.listdir(val_dir) if os.path.isdir(os.path.join(val_dir, d)) and not d.startswith(".")
+    )
+    dataset = FrameDataset(val_dir, preprocess, class_names)
+    if limit and limit < len(dataset):
+        # Evenly spaced so every class is represented, and the same subset for every precision
+        step = len(dataset) / limit
+        dataset = Subset(dataset, [int(i * step) for i in range(limit)])
+    return DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=workers), class_names
+
+
+def check(weights_path, val_dir, limit, batch_size, workers):
+    loss_fn = torch.nn.CrossEntropyLoss()
+    rows = []
+    for precision in PRECISIONS:
+        model, preprocess = load_model(weights_path, precision)
+        loader, class_names = val_loader(val_dir, preprocess, limit, batch_size, workers)
+        start = time.perf_counter()
+        with torch.no_grad():
+            loss, accuracy = validate_clip(model, loader, loss_fn, DEVICE, class_names)
+        elapsed = time.perf_counter() - start
+        rows.append((precision, accuracy, loss, len(loader.dataset) / elapsed, state_dict_mb(model)))
+
+    base_accuracy, base_speed = rows[0][1], rows[0][3]
+    print(f"device={DEVICE} threads={torch.get_num_threads()} images={len(loader.dataset)}")
+    print(f"{'precision':<10}{'accuracy':>10}{'delta':>9}{'loss':>9}{'images/sec':>12}{'speedup':>9}{'weights MB':>12}")
+    for precision, accuracy, loss, speed, size in rows:
+        print(
+            f"{precision:<10}{accuracy:>10.4f}{accuracy - base_accuracy:>+9.4f}{loss:>9.4f}"
+            f"{speed:>12.1f}{speed / base_speed:>8.2f}x{size:>12.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default="../fine_tuned_clip.pth")
+    parser.add_argument("--out", default=None, help="Where to write the int8 weights (default: <weights>.int8.pth)")
+    parser.add_argument("--check", action="store_true", help="Compare accuracy and speed of each precision")
+    parser.add_argument("--val-dir", default="../data/split/val")
+    parser.add_argument("--limit", type=int, default=None, help="Evaluate on at most this many val images")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=0, help="DataLoader workers")
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads override")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    if args.check:
+        check(args.weights, args.val_dir, args.limit, args.batch_size, args.workers)
+    else:
+        export_int8(args.weights, args.out or int8_weights_path(args.weights))
+
+
+if __name__ == "__main__":
+    main()
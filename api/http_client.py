@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import httpx
+
+from metrics import UPSTREAM_SECONDS
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+# Longest wait before a retry; a Retry-After above it returns the response instead
+HTTP_MAX_RETRY_DELAY = float(os.getenv("HTTP_MAX_RETRY_DELAY", "10"))
+
+# Responses worth retrying: rate limits and transient upstream failures
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_client = None
+
+def get_http_client():
+    """Shared AsyncClient so connections (and TLS sessions) to upstream APIs are reused."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+        )
+    return _client
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _retry_delay(attempt, response=None):
+    """Seconds to wait before the next attempt, or None when the upstream asks for longer than HTTP_MAX_RETRY_DELAY."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = float(retry_after)
+        return delay if delay <= HTTP_MAX_RETRY_DELAY else None
+    # Exponential backoff with jitter so parallel retries do not line up
+    return min(HTTP_BACKOFF * (2 ** attempt) * (0.5 + random.random()), HTTP_MAX_RETRY_DELAY)
+
+async def request_with_retries(method, url, retries=HTTP_RETRIES, **kwargs):
+    """Send a request with the shared client, retrying transport errors and 429/5xx responses.
+
+    The last response is returned as is (even if it is an error status), as is a
+    response whose Retry-After exceeds HTTP_MAX_RETRY_DELAY; the last transport error
+    is raised once retries are exhausted.
+    """
+    client = get_http_client()
+    target = httpx.URL(url)
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, upstream=target.host, endpoint=target.path,
+                                     outcome=type(e).__name__)
+            if attempt == retries:
+                raise
+            delay = _retry_delay(attempt)
+            logging.warning(f"{method} {url} failed ({e!r}), retrying in {delay:.2f}s")
+        else:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - start, upstream=target.host, endpoint=target.path,
+                                     outcome=f"{response.status_code // 100}xx")
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                return response
+            delay = _retry_delay(attempt, response)
+            if delay is None:
+                logging.warning(f"{method} {url} returned {response.status_code} with Retry-After "
+                                f"{response.headers['Retry-After']}s, above {HTTP_MAX_RETRY_DELAY:g}s; not retrying")
+                return response
+            logging.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+import uuid
+
+class QueueFullError(Exception):
+    pass
+
+class JobQueue:
+    """Bounded in-process job queue served by a fixed number of asyncio workers.
+
+    Jobs are coroutine factories; finished jobs are kept for result_ttl seconds so
+    clients can poll for the result. max_pending caps the unfinished jobs, queued and
+    running together. A job's cleanup runs once it is over, including when it never ran
+    because the queue was stopped. Not thread-safe: use it from the event loop only.
+    """
+
+    def __init__(self, workers=2, max_pending=8, result_ttl=3600):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.jobs = {}
+        self._cleanups = {}
+        self._unfinished = 0
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logging.info(f"Job queue started with {self.workers} workers (max {self.max_pending} pending).")
+
+    async def stop(self):
+        """Cancel the running jobs and fail the queued ones; every job's cleanup runs."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            job_id, _ = self._queue.get_nowait()
+            self._finish(job_id, "failed", error="Server shut down before the job ran")
+
+    def is_full(self):
+        return self._unfinished >= self.max_pending
+
+    def submit(self, owner, job_factory, cleanup=None):
+        """Queue job_factory() and return the job ID. Raises QueueFullError when at capacity.
+
+        cleanup() is called when the job is over, whether it finished, failed or never ran.
+        """
+        self.start()
+        self._purge_expired()
+        if self.is_full():
+            raise QueueFullError(f"Job queue is full ({self.max_pending} pending)")
+        job_id = str(uuid.uuid4())
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "owner": owner,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        if cleanup is not None:
+            self._cleanups[job_id] = cleanup
+        self._unfinished += 1
+        self._queue.put_nowait((job_id, job_factory))
+        return job_id
+
+    def get(self, job_id, owner):
+        self._purge_expired()
+        job = self.jobs.get(job_id)
+        if not job or job["owner"] != owner:
+            return None
+        return {key: value for key, value in job.items() if key != "owner"}
+
+    async def _worker(self, index):
+        while True:
+            job_id, job_factory = await self._queue.get()
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            try:
+                result = await job_factory()
+            except asyncio.CancelledError:
+                self._finish(job_id, "failed", error="Server shut down while the job was running")
+                raise
+            except Exception as e:
+                logging.error(f"Job {job_id} failed: {e}")
+                self._finish(job_id, "failed", error=getattr(e, "detail", None) or str(e))
+            else:
+                self._finish(job_id, "done", result=result)
+            finally:
+                self._queue.task_done()
+
+    def _finish(self, job_id, status, result=None, error=None):
+        job = self.jobs[job_id]
+        job.update(status=status, result=result, error=error, finished_at=time.time())
+        self._unfinished -= 1
+        cleanup = self._cleanups.pop(job_id, None)
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception as e:
+                logging.error(f"Cleanup of job {job_id} failed: {e}")
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self.jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
@@ -0,0 +1,66 @@
+import json
+
+class JSONArrayStream:
+    """Incremental parser for a JSON array that arrives in pieces (e.g. streamed GPT tokens).
+
+    feed() returns the array elements completed by the new text, so each one can be
+    used before the rest of the array exists. Anything before the opening '[' (prose,
+    a ```json fence) and after the closing ']' is ignored. An element that is not
+    valid JSON raises ValueError when it completes.
+    """
+
+    def __init__(self):
+        self._element = []  # characters of the element being read
+        self._depth = 0  # 0 before the array, 1 directly inside it
+        self._in_string = False
+        self._escaped = False
+        self.done = False
+
+    def feed(self, text):
+        items = []
+        for ch in text:
+            if self.done:
+                break
+            if self._depth == 0:
+                if ch == "[":
+                    self._depth = 1
+                continue
+            if self._in_string:
+                self._element.append(ch)
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    # The array itself closed; a trailing scalar element ends here
+                    self._flush(items)
+                    self.done = True
+                    continue
+            elif ch == "," and self._depth == 1:
+                self._flush(items)
+                continue
+
+            self._element.append(ch)
+            if ch in "}]" and self._depth == 1:
+                self._flush(items)
+        return items
+
+    def _flush(self, items):
+        text = "".join(self._element).strip()
+        self._element = []
+        if text:
+            items.append(json.loads(text))
+
+def parse_json_array(text):
+    """Elements of the first JSON array in text, for replies that are not streamed."""
+    return JSONArrayStream().feed(text)
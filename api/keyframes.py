@@ -0,0 +1,90 @@
+import os
+import numpy as np
+
+# Frames whose 64x36 grayscale thumbnails differ by less than this (mean absolute
+# difference, 0-1) from the last kept frame are treated as duplicates
+KEYFRAME_DUPLICATE_THRESHOLD = float(os.getenv("KEYFRAME_DUPLICATE_THRESHOLD", "0.02"))
+# Colour histogram (Bhattacharyya) distance between consecutive samples that counts as a scene cut
+SCENE_CUT_THRESHOLD = float(os.getenv("SCENE_CUT_THRESHOLD", "0.5"))
+THUMBNAIL_SIZE = (64, 36)
+
+def frame_signature(image):
+    """Cheap (thumbnail, colour histogram) signature of a BGR frame."""
+    import cv2
+    small = cv2.resize(image, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.float32) / 255.0
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    cv2.normalize(hist, hist)
+    return gray, hist
+
+def thumbnail_distance(a, b):
+    return float(np.abs(a[0] - b[0]).mean())
+
+def histogram_distance(a, b):
+    import cv2
+    return float(cv2.compareHist(a[1], b[1], cv2.HISTCMP_BHATTACHARYYA))
+
+class KeyframeFilter:
+    """Decides which sampled frames are worth a CLIP pass.
+
+    feed() takes each sampled frame in order and returns the frames to classify.
+    Near-duplicates of the last kept frame are dropped (static shots). When the frame
+    halfway through the gap before a sample is across a scene cut from the previous
+    sample, it is added too, so a short shot that falls between two samples still gets
+    a vote. weights[i] counts the sampled frames the i-th kept frame stands for, so
+    votes weighted by it match voting over every sample.
+    """
+
+    def __init__(self, duplicate_threshold=KEYFRAME_DUPLICATE_THRESHOLD, cut_threshold=SCENE_CUT_THRESHOLD):
+        self.duplicate_threshold = duplicate_threshold
+        self.cut_threshold = cut_threshold
+        self.weights = []
+        self.candidates = 0
+        self.skipped = 0
+        self.added = 0
+        self.cuts = 0
+        self._last_sample = None
+        self._last_kept = None
+
+    def feed(self, image, between=None):
+        """Return the frames to classify for this sample; between is a frame from the gap before it, if any."""
+        signature = frame_signature(image)
+        keep = []
+        if self._last_sample is not None:
+            between_signature = frame_signature(between) if between is not None else None
+            if between_signature is not None and self._is_cut(between_signature):
+                self.cuts += 1
+                if not self._is_duplicate(between_signature):
+                    keep.append(between)
+                    self.weights.append(1)
+                    self.added += 1
+                    self._last_kept = between_signature
+            elif self._is_cut(signature):
+                self.cuts += 1
+        self._last_sample = signature
+        self.candidates += 1
+
+        if self._is_duplicate(signature):
+            self.weights[-1] += 1
+            self.skipped += 1
+        else:
+            keep.append(image)
+            self.weights.append(1)
+            self._last_kept = signature
+        return keep
+
+    def _is_cut(self, signature):
+        return histogram_distance(self._last_sample, signature) > self.cut_threshold
+
+    def _is_duplicate(self, signature):
+        return self._last_kept is not None and thumbnail_distance(self._last_kept, signature) < self.duplicate_threshold
+
+    def report(self):
+        return {
+            "sampled": self.candidates,
+            "classified": len(self.weights),
+            "skipped_duplicates": self.skipped,
+            "added_at_cuts": self.added,
+            "scene_cuts": self.cuts,
+        }
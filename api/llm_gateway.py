@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+import openai
+from fastapi import APIRouter
+
+from ttl_cache import TTLCache
+from metrics import UPSTREAM_SECONDS
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# "openai" talks to the OpenAI API (or OPENAI_BASE_URL), "fake" answers locally for tests and demos
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").lower()
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_PER_USER = int(os.getenv("LLM_MAX_PER_USER", "2"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "600"))
+
+router = APIRouter()
+
+_client = None
+_global_limit = None
+_user_limits = {}  # user_id -> [semaphore, holders]
+_in_flight = 0
+response_cache = TTLCache(ttl=LLM_CACHE_TTL, max_entries=512)
+metrics = {}
+
+def get_client():
+    """One AsyncOpenAI client (and connection pool) for the whole process."""
+    global _client
+    if _client is None:
+        _client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=LLM_TIMEOUT, max_retries=2)
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+@asynccontextmanager
+async def _user_slot(user_id):
+    """Per-user semaphore, dropped again once nobody holds or waits for it."""
+    if not user_id:
+        yield
+        return
+    entry = _user_limits.setdefault(user_id, [asyncio.Semaphore(LLM_MAX_PER_USER), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _user_limits[user_id]
+
+def _global_semaphore():
+    global _global_limit
+    if _global_limit is None:
+        _global_limit = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _global_limit
+
+def normalize_prompt(text):
+    """Whitespace and case do not change the answer we want, so they do not change the cache key."""
+    return " ".join(text.split()).casefold()
+
+def cache_key(model, messages, max_tokens, temperature):
+    payload = json.dumps({
+        "model": model,
+        "messages": [[m["role"], normalize_prompt(m["content"])] for m in messages],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    })
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _record(purpose, latency, usage=None, cached=False, error=False, first_token=None):
+    m = metrics.setdefault(purpose, {
+        "calls": 0, "cache_hits": 0, "errors": 0,
+        "prompt_tokens": 0, "completion_tokens": 0,
+        "latency_seconds_total": 0.0, "latency_seconds_max": 0.0,
+        "streamed_calls": 0, "first_token_seconds_total": 0.0,
+    })
+    if cached:
+        m["cache_hits"] += 1
+        return
+    UPSTREAM_SECONDS.observe(latency, upstream=LLM_BACKEND, endpoint=purpose, outcome="error" if error else "ok")
+    m["calls"] += 1
+    if first_token is not None:
+        m["streamed_calls"] += 1
+        m["first_token_seconds_total"] += first_token
+    m["errors"] += int(error)
+    m["latency_seconds_total"] += latency
+    m["latency_seconds_max"] = max(m["latency_seconds_max"], latency)
+    if usage is not None:
+        m["prompt_tokens"] += usage.prompt_tokens or 0
+        m["completion_tokens"] += usage.completion_tokens or 0
+
+async def _fake_completion(messages):
+    from dev_upstreams import fake_reply
+    await asyncio.sleep(0.05)
+    return fake_reply(messages[-1]["content"]), None
+
+async def _fake_stream(messages):
+    from dev_upstreams import fake_reply
+    await asyncio.sleep(0.05)
+    content = fake_reply(messages[-1]["content"])
+    for i in range(0, len(content), 8):
+        await asyncio.sleep(0.005)
+        yield content[i:i + 8], None
+
+async def _openai_stream(model, messages, max_tokens, temperature):
+    kwargs = {"model": model, "messages": messages, "max_tokens": max_tokens,
+              "stream": True, "stream_options": {"include_usage": True}}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    stream = await get_client().chat.completions.create(**kwargs)
+    async for chunk in stream:
+        # The final chunk carries only the token usage
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        yield delta or "", chunk.usage
+
+async def _openai_completion(model, messages, max_tokens, temperature):
+    kwargs = {"model": model, "messages": messages, "max_tokens": max_tokens}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+    response = await get_client().chat.completions.create(**kwargs)
+    return response.choices[0].message.content.strip(), response.usage
+
+async def _complete(model, messages, max_tokens, temperature, user_id, purpose):
+    global _in_flight
+    # The user slot is taken first so one user's backlog never holds global slots while waiting
+    async with _user_slot(user_id), _global_semaphore():
+        _in_flight += 1
+        start = time.perf_counter()
+        try:
+            if LLM_BACKEND == "fake":
+                content, usage = await _fake_completion(messages)
+            else:
+                content, usage = await _openai_completion(model, messages, max_tokens, temperature)
+        except Exception:
+            _record(purpose, time.perf_counter() - start, error=True)
+            raise
+        finally:
+            _in_flight -= 1
+        _record(purpose, time.perf_counter() - start, usage)
+        return content
+
+class UncacheableReply(Exception):
+    """Raised by a cache load whose reply failed validation, so the cache does not keep it."""
+
+    def __init__(self, content):
+        super().__init__("reply failed validation")
+        self.content = content
+
+async def chat_completion(messages, model="gpt-4o", max_tokens=400, temperature=None,
+                          user_id=None, purpose="default", cache=False, validate=None):
+    """Return the assistant's reply text for a chat completion.
+
+    At most LLM_MAX_CONCURRENCY calls (streamed or not) run at once, and LLM_MAX_PER_USER per user_id.
+    With cache=True, identical prompts (ignoring whitespace and case) within
+    LLM_CACHE_TTL seconds share one upstream call and its answer. A reply that
+    validate(content) rejects is still returned, but not cached.
+    """
+    if not cache:
+        return await _complete(model, messages, max_tokens, temperature, user_id, purpose)
+
+    loaded = False
+
+    async def load():
+        nonlocal loaded
+        loaded = True
+        content = await _complete(model, messages, max_tokens, temperature, user_id, purpose)
+        if validate is not None and not validate(content):
+            raise UncacheableReply(content)
+        return content
+
+    try:
+        content = await response_cache.get(cache_key(model, messages, max_tokens, temperature), load)
+    except UncacheableReply as e:
+        # Callers sharing this load get the same reply and handle it like any other
+        return e.content
+    if not loaded:
+        _record(purpose, 0.0, cached=True)
+    return content
+
+async def chat_completion_stream(messages, model="gpt-4o", max_tokens=400, temperature=None,
+                                 user_id=None, purpose="default", cache=False, validate=None):
+    """Yield the assistant's reply as text pieces while it is being generated.
+
+    Same limits as chat_completion. With cache=True a fresh cached answer is yielded
+    in one piece, and a completed stream that validate (if given) accepts is stored
+    for later callers.
+    """
+    global _in_flight
+    key = cache_key(model, messages, max_tokens, temperature) if cache else None
+    if key is not None:
+        content = response_cache.peek(key)
+        if content is not None:
+            _record(purpose, 0.0, cached=True)
+            yield content
+            return
+
+    parts = []
+    usage = None
+    async with _user_slot(user_id), _global_semaphore():
+        _in_flight += 1
+        start = time.perf_counter()
+        first_token = None
+        try:
+            if LLM_BACKEND == "fake":
+                pieces = _fake_stream(messages)
+            else:
+                pieces = _openai_stream(model, messages, max_tokens, temperature)
+            async for delta, chunk_usage in pieces:
+                usage = chunk_usage or usage
+                if not delta:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(delta)
+                yield delta
+        except Exception:
+            _record(purpose, time.perf_counter() - start, error=True)
+            raise
+        finally:
+            _in_flight -= 1
+        _record(purpose, time.perf_counter() - start, usage, first_token=first_token or 0.0)
+
+    content = "".join(parts)
+    if key is not None and (validate is None or validate(content)):
+        response_cache.put(key, content)
+
+def llm_stats():
+    return {
+        "backend": LLM_BACKEND,
+        "in_flight": _in_flight,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "users_waiting_or_running": len(_user_limits),
+        "cache": dict(response_cache.stats),
+        "purposes": metrics,
+    }
+
+@router.on_event("shutdown")
+async def shutdown_client():
+    await close_client()
+
+@router.get("/llm/stats")
+def api_llm_stats():
+    return llm_stats()
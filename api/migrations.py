@@ -0,0 +1,73 @@
+"""
+Versioned schema migrations for the analysis database.
+
+The schema version is stored in SQLite's PRAGMA user_version. Each migration runs
+in its own transaction together with the version bump, so a failed migration leaves
+the database at the previous version. Apply pending migrations by hand with:
+    python migrations.py [path/to/analysis.sqlite3]
+"""
+import logging
+import sys
+
+from db import transaction
+
+def create_analysis_table(c):
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS analysis (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        title TEXT,
+        date TEXT,
+        result TEXT,
+        video_filename TEXT,
+        score INTEGER
+    )
+    """)
+
+def add_explanation_column(c):
+    # Formerly the ad-hoc add_explanation_column.py script; databases it already ran on are left alone
+    columns = [row[1] for row in c.execute("PRAGMA table_info(analysis)").fetchall()]
+    if "explanation" not in columns:
+        c.execute("ALTER TABLE analysis ADD COLUMN explanation TEXT")
+
+def add_user_date_index(c):
+    # Serves both the user_id filter and the newest-first keyset pagination of the history
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analysis_user_date ON analysis (user_id, date DESC, id DESC)")
+
+def order_by_insertion(c):
+    # Dates have day resolution, so rows of the same day are ordered by rowid, which grows
+    # with every insert. Every index ends with the rowid, so (user_id, date) read backwards
+    # gives date DESC, rowid DESC without a sort.
+    c.execute("DROP INDEX IF EXISTS idx_analysis_user_date")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_analysis_user_date_rowid ON analysis (user_id, date)")
+
+# (version, description, function). Append new migrations; never reorder or edit applied ones.
+MIGRATIONS = [
+    (1, "create analysis table", create_analysis_table),
+    (2, "add explanation column", add_explanation_column),
+    (3, "index analyses by user and date", add_user_date_index),
+    (4, "order analyses of the same day by insertion", order_by_insertion),
+]
+
+def schema_version(path):
+    with transaction(path) as c:
+        return c.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(path):
+    """Apply all pending migrations to the database at path and return the resulting version."""
+    current = schema_version(path)
+    for version, description, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        logging.info(f"Applying migration {version} ({description}) to {path}")
+        with transaction(path) as c:
+            c.execute("BEGIN")
+            apply(c)
+            c.execute(f"PRAGMA user_version = {version}")
+        current = version
+    return current
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "analysis.sqlite3"
+    print(f"{db_path} is at schema version {migrate(db_path)}")
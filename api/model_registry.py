@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+# "eager" starts loading every registered model in the background when the server starts, "lazy" on first use
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "eager").lower()
+
+router = APIRouter()
+
+class ModelRegistry:
+    """Process-wide store that loads each model once and shares it across requests."""
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._load_locks = {}
+        self._inference_locks = {}
+        self._load_seconds = {}
+        self._errors = {}
+
+    def register(self, name, loader, thread_safe=True):
+        """Register a zero-argument loader. Models that are not thread safe get an inference lock."""
+        self._loaders[name] = loader
+        self._load_locks[name] = threading.Lock()
+        self._inference_locks[name] = None if thread_safe else threading.Lock()
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._load_locks[name]:
+            # Another request may have finished loading while we waited for the lock
+            if name not in self._models:
+                logging.info(f"Loading model '{name}'.")
+                start = time.perf_counter()
+                try:
+                    self._models[name] = self._loaders[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    logging.error(f"Failed to load model '{name}': {e}")
+                    raise
+                self._load_seconds[name] = time.perf_counter() - start
+                self._errors.pop(name, None)
+                logging.info(f"Model '{name}' loaded in {self._load_seconds[name]:.2f}s.")
+        return self._models[name]
+
+    def inference_lock(self, name):
+        """Lock to hold while running a model that cannot serve concurrent calls (or None)."""
+        return self._inference_locks[name]
+
+    def warm_up(self, names=None, raise_errors=True):
+        for name in names or list(self._loaders):
+            try:
+                self.get(name)
+            except Exception:
+                # Already logged and reported in status(); keep loading the others
+                if raise_errors:
+                    raise
+
+    def status(self):
+        return {
+            name: {
+                "loaded": name in self._models,
+                "load_seconds": round(self._load_seconds[name], 3) if name in self._load_seconds else None,
+                "error": self._errors.get(name),
+            }
+            for name in self._loaders
+        }
+
+registry = ModelRegistry()
+warmup_future = None
+
+@router.on_event("startup")
+async def warm_up_models():
+    global warmup_future
+    if MODEL_WARMUP == "eager":
+        # Loading runs off the event loop, so routes that need no model answer right away;
+        # /ready reports 503 until every model is loaded
+        logging.info("Warming up models in the background (MODEL_WARMUP=eager).")
+        warmup_future = asyncio.get_running_loop().run_in_executor(None, registry.warm_up, None, False)
+
+@router.get("/ready")
+def readiness():
+    """Readiness probe with per-model load times. Lazy mode is ready before any model is loaded."""
+    models = registry.status()
+    ready = MODEL_WARMUP != "eager" or all(m["loaded"] for m in models.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "warmup": MODEL_WARMUP, "models": models},
+    )
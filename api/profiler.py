@@ -0,0 +1,112 @@
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs
+
+# Per-request sampling profiler: off unless PROFILE_REQUESTS=1. Then a request with the
+# header `X-Profile: 1` (or `profile=1` in the query string) is sampled while it runs.
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "../.cache/profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+
+class SamplingProfiler:
+    """Samples the Python stack of every thread from a background thread.
+
+    Stacks are counted in the collapsed format ("thread;outer;...;inner count" per line)
+    that flamegraph.pl and speedscope read. All threads are sampled because the
+    analysis runs on executor threads, so requests running at the same time show up too.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+def profiling_requested(scope):
+    headers = dict(scope["headers"])
+    if headers.get(b"x-profile", b"").lower() in (b"1", b"true"):
+        return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("profile", [""])[-1].lower() in ("1", "true")
+
+class ProfilerMiddleware:
+    """Profile single requests on demand and write the stacks to PROFILE_DIR.
+
+    The response carries the file name in an X-Profile-File header. Only one request
+    is profiled at a time; others asking for it run unprofiled.
+    """
+
+    def __init__(self, app, enabled=PROFILE_REQUESTS, profile_dir=PROFILE_DIR):
+        self.app = app
+        self.enabled = enabled
+        self.profile_dir = profile_dir
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or not profiling_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            logging.warning(f"Not profiling {scope['path']}: another request is being profiled")
+            await self.app(scope, receive, send)
+            return
+
+        route = scope["path"].strip("/").replace("/", "_") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{route}-{uuid.uuid4().hex[:6]}.folded"
+        path = os.path.join(self.profile_dir, name)
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", name.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler().start()
+        start = time.perf_counter()
+        try:
+            # Covers the whole response, including streamed bodies
+            await self.app(scope, receive, send_with_header)
+        finally:
+            profiler.stop()
+            self._busy.release()
+            try:
+                profiler.write(path)
+                logging.info(f"Profiled {scope['path']}: {profiler.samples} samples over "
+                             f"{time.perf_counter() - start:.2f}s written to {path}")
+            except OSError as e:
+                logging.warning(f"Could not write profile {path}: {e}")
@@ -0,0 +1,15 @@
+import json
+from fastapi.responses import StreamingResponse
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """Stream an async iterator of sse_event() strings as text/event-stream."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Proxies (nginx) must not buffer the stream, or the first event arrives with the last
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
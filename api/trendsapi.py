@@ -1,21 +1,33 @@
-import requests
-from fastapi import APIRouter, Depends, HTTPException
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query
 from clerk_auth import get_current_user_id 
+from ttl_cache import TTLCache
+from http_client import request_with_retries, close_http_client
+from trend_index import build_growth_matrix
+from llm_gateway import chat_completion
 import os
 import logging
-import openai
-from datetime import datetime, timedelta
 import re
 import json
 
 router = APIRouter()
 
 NEWSAPI_KEY = os.getenv("NEWSAPI_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Point this at dev_upstreams.py to run without a real NewsAPI account
+NEWSAPI_BASE_URL = os.getenv("NEWSAPI_BASE_URL", "https://newsapi.org")
 LOAD_COUNT = 5
+HEADLINE_COUNT = 50
+# Longest window /trend-growth can be asked for; shorter windows are slices of it
+TREND_MAX_WINDOW_DAYS = int(os.getenv("TREND_MAX_WINDOW_DAYS", "30"))
 
-def categorize_articles_with_gpt(articles):
-    client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# Headlines are the same for every user, so both the raw NewsAPI response and the
+# GPT categorization are shared. Fresh for NEWS_CACHE_TTL seconds, then served stale
+# for up to NEWS_STALE_TTL more seconds while a single background refresh runs.
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "300"))
+NEWS_STALE_TTL = float(os.getenv("NEWS_STALE_TTL", "1800"))
+news_cache = TTLCache(ttl=NEWS_CACHE_TTL, stale_ttl=NEWS_STALE_TTL)
+
+async def categorize_articles_with_gpt(articles):
     # Prepare the prompt
     prompt = (
         "Categorize the following news articles into one of these categories: Tech, Science, Art, Sports.\n"
@@ -29,13 +41,12 @@ def categorize_articles_with_gpt(articles):
     )
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
+        content = await chat_completion(
+            [{"role": "user", "content": prompt}],
             max_tokens=800,
             temperature=0.3,
+            purpose="trends",
         )
-        content = response.choices[0].message.content.strip()
         # Remove markdown code block markers if present
         if content.startswith("```"):
             content = content.split('\n', 1)[1]
@@ -52,14 +63,33 @@ def categorize_articles_with_gpt(articles):
         logging.exception("Failed to categorize articles with GPT")
         raise HTTPException(status_code=500, detail=f"Failed to categorize articles: {e}")
 
-def fetch_trends_from_newsapi():
-    url = f"https://newsapi.org/v2/top-headlines?language=en&pageSize={LOAD_COUNT}"
-    headers = {"Authorization": NEWSAPI_KEY}
-    response = requests.get(url, headers=headers)
+async def fetch_headlines_from_newsapi(page_size=HEADLINE_COUNT):
+    url = f"{NEWSAPI_BASE_URL}/v2/top-headlines?language=en&pageSize={page_size}"
+    headers = {"Authorization": NEWSAPI_KEY} if NEWSAPI_KEY else {}
+    try:
+        response = await request_with_retries("GET", url, headers=headers)
+    except httpx.HTTPError as e:
+        logging.error("NewsAPI request failed: %s", e)
+        raise HTTPException(status_code=502, detail="Failed to fetch news trends")
     if response.status_code != 200:
         logging.error("NewsAPI error: %s", response.text)
         raise HTTPException(status_code=500, detail="Failed to fetch news trends")
-    articles = response.json().get("articles", [])
+    return response.json().get("articles", [])
+
+async def fetch_headlines_with_growth():
+    articles = await fetch_headlines_from_newsapi()
+    return {"articles": articles, "growth": build_growth_matrix(articles, TREND_MAX_WINDOW_DAYS)}
+
+async def get_headlines_with_growth():
+    """Latest HEADLINE_COUNT headlines plus their growth matrix, built once per fetch."""
+    return await news_cache.get("headlines", fetch_headlines_with_growth)
+
+async def get_headlines():
+    """Latest HEADLINE_COUNT headlines; /trends uses the first LOAD_COUNT, /trend-growth all of them."""
+    return (await get_headlines_with_growth())["articles"]
+
+async def fetch_trends_from_newsapi():
+    articles = (await get_headlines())[:LOAD_COUNT]
     prepared_articles = []
     for idx, article in enumerate(articles, 1):
         prepared_articles.append({
@@ -69,41 +99,27 @@ def fetch_trends_from_newsapi():
             "details": article.get("content"),
             "image": article.get("urlToImage"),
         })
-    return categorize_articles_with_gpt(prepared_articles)
+    return await categorize_articles_with_gpt(prepared_articles)
+
+@router.on_event("shutdown")
+async def shutdown_http_client():
+    await close_http_client()
 
 @router.get("/trends")
-def get_trends(user_id: str = Depends(get_current_user_id)):
-    return fetch_trends_from_newsapi()
+async def get_trends(user_id: str = Depends(get_current_user_id)):
+    return await news_cache.get("trends", fetch_trends_from_newsapi)
+
+@router.get("/trends/cache")
+def get_trends_cache_stats():
+    return news_cache.stats
 
 @router.get("/trend-growth")
-async def trend_growth(id: int):
-    # Fetch the latest articles
-    url = f"https://newsapi.org/v2/top-headlines?language=en&pageSize=50"
-    headers = {"Authorization": NEWSAPI_KEY}
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        logging.error("NewsAPI error: %s", response.text)
-        raise HTTPException(status_code=500, detail="Failed to fetch news trends")
-    articles = response.json().get("articles", [])
+async def trend_growth(id: int, days: int = Query(5, ge=1, le=TREND_MAX_WINDOW_DAYS)):
+    # Growth for every article is precomputed with the headlines, so this is a lookup
+    headlines = await get_headlines_with_growth()
 
-    if id < 1 or id > len(articles):
+    if id < 1 or id > len(headlines["articles"]):
         raise HTTPException(status_code=404, detail="Article not found")
-    target_article = articles[id - 1]
-    title = target_article.get("title", "")
-
-    now = datetime.utcnow()
-    buckets = [0, 0, 0, 0, 0]  # 5 days
-    for art in articles:
-        pub = art.get("publishedAt")
-        if not pub:
-            continue
-        try:
-            pub_dt = datetime.strptime(pub, "%Y-%m-%dT%H:%M:%SZ")
-        except Exception:
-            continue
-        days_ago = (now - pub_dt).days
-        if 0 <= days_ago < 5:
-            if any(word.lower() in art.get("title", "").lower() for word in title.split() if len(word) > 3):
-                buckets[4 - days_ago] += 1
-
-    return {"growth": buckets}
+
+    # One bucket per day, oldest first, for the last `days` days
+    return {"growth": headlines["growth"][id - 1, -days:].tolist()}
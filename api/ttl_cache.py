@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+
+class TTLCache:
+    """Async cache with a time-to-live, single-flight loading and stale-while-revalidate.
+
+    Within ttl seconds a value is served as is. Between ttl and ttl + stale_ttl the
+    stale value is served immediately while one background task refreshes it. After
+    that, callers wait for a fresh load. Concurrent misses for the same key share a
+    single call to the loader.
+    """
+
+    def __init__(self, ttl, stale_ttl=0, max_entries=128, clock=time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = {}  # key -> (value, loaded_at)
+        self._inflight = {}  # key -> asyncio.Task
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "loads": 0, "errors": 0}
+
+    async def get(self, key, loader):
+        """Return the cached value for key, calling the async loader() when it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, loaded_at = entry
+            age = self.clock() - loaded_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                self._load(key, loader)
+                return value
+        self.stats["misses"] += 1
+        # shield: a cancelled caller must not cancel the load other callers are waiting on
+        return await asyncio.shield(self._load(key, loader))
+
+    def peek(self, key):
+        """Return the fresh value for key without loading, or None."""
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() - entry[1] < self.ttl:
+            self.stats["hits"] += 1
+            return entry[0]
+        return None
+
+    def put(self, key, value):
+        self._entries[key] = (value, self.clock())
+        self._evict()
+
+    def invalidate(self, key=None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def _load(self, key, loader):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run_loader(key, loader))
+            # Background refreshes have no awaiting caller; mark their errors as handled
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _run_loader(self, key, loader):
+        try:
+            self.stats["loads"] += 1
+            value = await loader()
+            self.put(key, value)
+            return value
+        except Exception as e:
+            self.stats["errors"] += 1
+            logging.warning(f"Cache load for {key!r} failed: {e}")
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _evict(self):
+        if len(self._entries) > self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k][1])
+            del self._entries[oldest]
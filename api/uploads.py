@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import os
+import aiofiles
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Largest accepted upload in bytes (default 500 MB) and the chunk size used to copy it to disk
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(500 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+class UploadTooLarge(Exception):
+    pass
+
+async def save_upload(upload, path, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_BYTES):
+    """Copy an UploadFile to path chunk by chunk and return (sha256 hex digest, size in bytes).
+
+    Only one chunk is held in memory at a time. Raises HTTPException(413) once the
+    upload grows past max_bytes; the partial file is removed.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes.")
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return digest.hexdigest(), size
+
+class MaxBodySizeMiddleware:
+    """Reject request bodies larger than max_bytes on the given path prefixes.
+
+    The limit is checked against Content-Length before anything is read and again
+    while the body arrives, so oversized uploads are cut off before they are spooled
+    to disk by the multipart parser.
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES, paths=("/analyze",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    too_large = True
+                    raise UploadTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                if response_started:
+                    return
+                response_started = True
+                if too_large:
+                    # The app turned the aborted body into its own error response; answer 413 instead
+                    await self._reject(scope, receive, send)
+                    return
+            elif too_large:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLarge:
+            if response_started:
+                return
+            response_started = True
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        logging.warning(f"Rejected request body over {self.max_bytes} bytes on {scope['path']}")
+        response = JSONResponse(status_code=413, content={"detail": f"Upload exceeds {self.max_bytes} bytes."})
+        await response(scope, receive, send)
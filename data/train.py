@@ -1,13 +1,23 @@
 import os
+import json
+import math
+import sys
+import time
+import argparse
 import logging
 from collections import Counter
 from tqdm import tqdm
 from PIL import Image
+import numpy as np
 import torch
 import clip
 from torchvision.transforms import Compose, Resize, CenterCrop, ToTensor, Normalize
 from torch.utils.data import DataLoader, Dataset
 
+# The backbone is shared with the API, which loads the weights and heads trained here
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from clip_inference import CLIP_BACKBONE  # noqa: E402
+
 # Set up logging
 logging.basicConfig(
     level=logging.INFO,
@@ -47,51 +57,171 @@ class FrameDataset(Dataset):
             return self.__getitem__((idx + 1) % len(self.samples))  # Skip to next image
         return image, label
 
+# Preprocessed tensors of a FrameDataset, written once and memory-mapped afterwards
+class TensorCacheDataset(Dataset):
+    """Reads preprocessed frames from a tensor cache written by build_tensor_cache.
+
+    Items are views into the memory-mapped array, so no JPEG is decoded and nothing is
+    copied until the batch is collated. The file is opened lazily in each DataLoader
+    worker; a np.memmap would otherwise be pickled (copied) into every worker.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, "index.json")) as f:
+            self.index = json.load(f)
+        self.classes = self.index["classes"]
+        self.labels = np.load(os.path.join(cache_dir, "labels.npy"))
+        self._images = None
+        logging.info(f"Initialized TensorCacheDataset with {len(self.labels)} samples from {cache_dir}")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        if self._images is None:
+            # Copy-on-write mapping: pages are shared with the page cache and never written back
+            self._images = np.load(os.path.join(self.cache_dir, "images.npy"), mmap_mode="c")
+        return torch.from_numpy(self._images[idx]), int(self.labels[idx])
+
+def file_fingerprints(paths):
+    """[path, size, mtime_ns] per file, so an edited frame invalidates caches built from it."""
+    fingerprints = []
+    for path in paths:
+        st = os.stat(path)
+        fingerprints.append([path, st.st_size, st.st_mtime_ns])
+    return fingerprints
+
+def tensor_cache_is_current(cache_dir, dataset, dtype):
+    """True when cache_dir holds the tensors of exactly this dataset's samples, unchanged since."""
+    try:
+        with open(os.path.join(cache_dir, "index.json")) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        index.get("classes") == dataset.classes
+        and index.get("samples") == [path for path, _ in dataset.samples]
+        and index.get("files") == file_fingerprints(path for path, _ in dataset.samples)
+        and index.get("dtype") == dtype
+    )
+
+def build_tensor_cache(dataset, cache_dir, dtype="float16", batch_size=64, num_workers=0):
+    """Preprocess every sample of a FrameDataset once into cache_dir/images.npy (+ labels.npy, index.json).
+
+    float16 halves the file; CLIP's encode_image casts its input to the model dtype anyway.
+    """
+    if not len(dataset):
+        raise ValueError(f"No frames found in {dataset.data_dir} for the classes {dataset.classes}; "
+                         "nothing to cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    loader = make_loader(dataset, batch_size, shuffle=False, num_workers=num_workers)
+    shape = (len(dataset),) + tuple(dataset[0][0].shape)
+    images_tmp = os.path.join(cache_dir, "images.npy.tmp")
+    images = np.lib.format.open_memmap(images_tmp, mode="w+", dtype=dtype, shape=shape)
+    labels = np.zeros(len(dataset), dtype=np.int64)
+    position = 0
+    start = time.perf_counter()
+    for batch, batch_labels in tqdm(loader, desc=f"Caching tensors in {cache_dir}"):
+        images[position:position + len(batch)] = batch.numpy().astype(dtype)
+        labels[position:position + len(batch)] = batch_labels.numpy()
+        position += len(batch)
+    images.flush()
+    del images
+
+    # Replace the files only once everything is written, index last
+    os.replace(images_tmp, os.path.join(cache_dir, "images.npy"))
+    np.save(os.path.join(cache_dir, "labels.npy"), labels)
+    samples = [path for path, _ in dataset.samples]
+    index = {"classes": dataset.classes, "samples": samples, "files": file_fingerprints(samples), "dtype": dtype,
+             "shape": list(shape)}
+    with open(os.path.join(cache_dir, "index.json.tmp"), "w") as f:
+        json.dump(index, f)
+    os.replace(os.path.join(cache_dir, "index.json.tmp"), os.path.join(cache_dir, "index.json"))
+    elapsed = time.perf_counter() - start
+    logging.info(f"Cached {len(dataset)} tensors in {elapsed:.1f}s ({len(dataset) / elapsed:.1f} images/sec)")
+
+def cached_dataset(data_dir, cache_dir, preprocess, class_names, dtype="float16", num_workers=0):
+    """TensorCacheDataset for data_dir, (re)building the cache when the samples changed."""
+    dataset = FrameDataset(data_dir, preprocess, class_names)
+    if not tensor_cache_is_current(cache_dir, dataset, dtype):
+        build_tensor_cache(dataset, cache_dir, dtype, num_workers=num_workers)
+    return TensorCacheDataset(cache_dir)
+
+def make_loader(dataset, batch_size, shuffle, num_workers=0, prefetch_factor=2, pin_memory=False):
+    kwargs = {}
+    if num_workers > 0:
+        # Workers stay alive between epochs instead of being re-forked each time
+        kwargs = {"prefetch_factor": prefetch_factor, "persistent_workers": True}
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers,
+                      pin_memory=pin_memory, **kwargs)
+
+def autocast(device, enabled):
+    """bf16 autocast for the forward pass; a no-op context when disabled."""
+    return torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16, enabled=enabled)
+
 # Training function
-def train_clip(model, dataloader, optimizer, loss_fn, device, class_texts):
+def train_clip(model, dataloader, optimizer, loss_fn, device, class_texts,
+               scheduler=None, accumulation_steps=1, use_autocast=False):
+    """One epoch. Gradients of accumulation_steps batches are summed before each optimizer
+    (and scheduler) step, for an effective batch of batch_size * accumulation_steps."""
     model.train()
     total_loss = 0
+    images_seen = 0
+    start = time.perf_counter()
 
     with torch.no_grad():
         text_inputs = torch.cat([clip.tokenize(f"a photo of a {c}") for c in class_texts]).to(device)
         text_features = model.encode_text(text_inputs)
 
-    for images, labels in tqdm(dataloader, desc="Training"):
-        images, labels = images.to(device), labels.to(device)
-        optimizer.zero_grad()
+    optimizer.zero_grad()
+    num_batches = len(dataloader)
+    for step, (images, labels) in enumerate(tqdm(dataloader, desc="Training"), start=1):
+        images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
 
-        image_features = model.encode_image(images)
-        logits_per_image = (image_features @ text_features.T)
-        loss = loss_fn(logits_per_image, labels)
-        loss.backward()
-        optimizer.step()
+        with autocast(device, use_autocast):
+            image_features = model.encode_image(images)
+            logits_per_image = (image_features @ text_features.T)
+        loss = loss_fn(logits_per_image.float(), labels)
+        # The last group of the epoch can be shorter; average over the batches it really has
+        group_start = (step - 1) // accumulation_steps * accumulation_steps
+        (loss / min(accumulation_steps, num_batches - group_start)).backward()
+        if step % accumulation_steps == 0 or step == num_batches:
+            optimizer.step()
+            optimizer.zero_grad()
+            if scheduler is not None:
+                scheduler.step()
         total_loss += loss.item()
+        images_seen += labels.size(0)
 
     avg_loss = total_loss / len(dataloader)
-    logging.info(f"Training Loss: {avg_loss:.4f}")
+    elapsed = time.perf_counter() - start
+    logging.info(f"Training Loss: {avg_loss:.4f}, {images_seen / elapsed:.1f} images/sec")
     return avg_loss
 
 # Validation function
-def validate_clip(model, dataloader, loss_fn, device, class_texts):
+def validate_clip(model, dataloader, loss_fn, device, class_texts, use_autocast=False):
     model.eval()
     total_loss = 0
     correct = 0
     total = 0
+    start = time.perf_counter()
 
     with torch.no_grad():
         text_inputs = torch.cat([clip.tokenize(f"a photo of a {c}") for c in class_texts]).to(device)
         text_features = model.encode_text(text_inputs)
 
         for images, labels in tqdm(dataloader, desc="Validating"):
-            images, labels = images.to(device), labels.to(device)
+            images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
 
             if labels.max() >= len(class_texts) or labels.min() < 0:
                 logging.error(f"Invalid label detected. Labels must be in [0, {len(class_texts)-1}].")
                 raise ValueError("Label out of range.")
 
-            image_features = model.encode_image(images)
-            logits_per_image = (image_features @ text_features.T)
-            loss = loss_fn(logits_per_image, labels)
+            with autocast(device, use_autocast):
+                image_features = model.encode_image(images)
+                logits_per_image = (image_features @ text_features.T)
+            loss = loss_fn(logits_per_image.float(), labels)
             total_loss += loss.item()
 
             preds = logits_per_image.argmax(dim=1)
@@ -100,22 +230,198 @@ def validate_clip(model, dataloader, loss_fn, device, class_texts):
 
     accuracy = correct / total
     avg_loss = total_loss / len(dataloader)
-    logging.info(f"Validation Loss: {avg_loss:.4f}, Accuracy: {accuracy:.4f}")
+    elapsed = time.perf_counter() - start
+    logging.info(f"Validation Loss: {avg_loss:.4f}, Accuracy: {accuracy:.4f}, {total / elapsed:.1f} images/sec")
     return avg_loss, accuracy
 
+def make_scheduler(optimizer, total_steps, warmup_steps=0, schedule="constant"):
+    """Per optimizer step: linear warmup over warmup_steps, then constant or cosine decay to zero."""
+    def factor(step):
+        if step < warmup_steps:
+            return (step + 1) / warmup_steps
+        if schedule == "cosine":
+            progress = (step - warmup_steps) / max(1, total_steps - warmup_steps)
+            return 0.5 * (1 + math.cos(math.pi * min(1.0, progress)))
+        return 1.0
+    return torch.optim.lr_scheduler.LambdaLR(optimizer, factor)
+
+def save_checkpoint(path, model, optimizer, scheduler, epoch, class_names):
+    """Write everything needed to resume after `epoch` (1-based) atomically: a crash mid-write keeps the old file."""
+    checkpoint = {
+        "epoch": epoch,
+        "classes": list(class_names),
+        "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(),
+        "scheduler": scheduler.state_dict(),
+        "rng": torch.get_rng_state(),
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    torch.save(checkpoint, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    logging.info(f"Checkpoint for epoch {epoch} saved as {path}")
+
+def load_checkpoint(path, model, optimizer, scheduler, class_names, device):
+    """Restore a save_checkpoint file and return the number of epochs it completed."""
+    checkpoint = torch.load(path, map_location=device, weights_only=False)
+    if checkpoint["classes"] != list(class_names):
+        raise ValueError(f"{path} was trained on different classes: {checkpoint['classes']}")
+    model.load_state_dict(checkpoint["model"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    scheduler.load_state_dict(checkpoint["scheduler"])
+    torch.set_rng_state(checkpoint["rng"])
+    logging.info(f"Resumed from {path} after epoch {checkpoint['epoch']}")
+    return checkpoint["epoch"]
+
+def memory_metrics(device):
+    """Peak memory so far: process RSS, plus allocated CUDA memory when training on the GPU."""
+    metrics = {}
+    try:
+        # Unix only; export_clip.py imports this file on Windows too
+        import resource
+    except ImportError:
+        pass
+    else:
+        # ru_maxrss is in kB on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        metrics["max_rss_mb"] = round(max_rss / (2**20 if sys.platform == "darwin" else 1024), 1)
+    if torch.device(device).type == "cuda":
+        metrics["cuda_max_allocated_mb"] = round(torch.cuda.max_memory_allocated() / 2**20, 1)
+    return metrics
+
+def append_metrics(path, record):
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+# Embedding-only training: the image encoder stays frozen and only a linear head is trained
+def sample_files(dataset):
+    """file_fingerprints of the dataset's frames; a tensor cache has them from when it was built."""
+    if isinstance(dataset, TensorCacheDataset):
+        return dataset.index["files"]
+    return file_fingerprints(path for path, _ in dataset.samples)
+
+def encode_features(model, dataloader, device):
+    """L2-normalized image features of every sample and their labels, on the CPU."""
+    model.eval()
+    features, labels = [], []
+    start = time.perf_counter()
+    with torch.no_grad():
+        for images, batch_labels in tqdm(dataloader, desc="Encoding"):
+            batch_features = model.encode_image(images.to(device, non_blocking=True)).float()
+            features.append((batch_features / batch_features.norm(dim=-1, keepdim=True)).cpu())
+            labels.append(batch_labels)
+    features, labels = torch.cat(features), torch.cat(labels)
+    elapsed = time.perf_counter() - start
+    logging.info(f"Encoded {len(labels)} images in {elapsed:.1f}s ({len(labels) / elapsed:.1f} images/sec)")
+    return features, labels
+
+def cached_features(model, dataset, dataloader, cache_path, device):
+    """encode_features, saved to cache_path and reused while the frame files and classes are unchanged."""
+    key = {"backbone": CLIP_BACKBONE, "classes": list(dataset.classes), "files": sample_files(dataset)}
+    if os.path.exists(cache_path):
+        cached = torch.load(cache_path)
+        if all(cached.get(name) == value for name, value in key.items()):
+            logging.info(f"Loaded {len(cached['labels'])} cached features from {cache_path}")
+            return cached["features"], cached["labels"]
+    features, labels = encode_features(model, dataloader, device)
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    torch.save({**key, "features": features, "labels": labels}, f"{cache_path}.tmp")
+    os.replace(f"{cache_path}.tmp", cache_path)
+    return features, labels
+
+def zero_shot_weights(model, class_texts, device):
+    """Class-name text embeddings scaled like CLIP's logits, the starting point of the head."""
+    with torch.no_grad():
+        text_inputs = torch.cat([clip.tokenize(f"a photo of a {c}") for c in class_texts]).to(device)
+        text_features = model.encode_text(text_inputs).float()
+        text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+        return (model.logit_scale.exp().float() * text_features).cpu()
+
+def head_accuracy(head, features, labels):
+    with torch.no_grad():
+        return (head(features).argmax(dim=-1) == labels).float().mean().item()
+
+def train_linear_head(train_features, train_labels, val_features, val_labels, init_weight,
+                      epochs=100, lr=1e-3, weight_decay=1e-4, batch_size=256):
+    """Train a linear classifier on frozen features, starting from the zero-shot weights."""
+    head = torch.nn.Linear(init_weight.shape[1], init_weight.shape[0])
+    with torch.no_grad():
+        head.weight.copy_(init_weight)
+        head.bias.zero_()
+    logging.info(f"Zero-shot validation accuracy: {head_accuracy(head, val_features, val_labels):.4f}")
+
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=weight_decay)
+    loss_fn = torch.nn.CrossEntropyLoss()
+    for epoch in range(epochs):
+        order = torch.randperm(len(train_labels))
+        total_loss = 0
+        for i in range(0, len(order), batch_size):
+            batch = order[i:i + batch_size]
+            optimizer.zero_grad()
+            loss = loss_fn(head(train_features[batch]), train_labels[batch])
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(batch)
+        if (epoch + 1) % 10 == 0 or epoch + 1 == epochs:
+            accuracy = head_accuracy(head, val_features, val_labels)
+            logging.info(f"Head epoch {epoch + 1}/{epochs}: loss {total_loss / len(order):.4f}, val accuracy {accuracy:.4f}")
+    return head, head_accuracy(head, val_features, val_labels)
+
+def save_head(head, path, class_names, **metadata):
+    """Write the head in the format api/clip_head.py loads (CLIP_HEAD_PATH)."""
+    artifact = {"backbone": CLIP_BACKBONE, "classes": list(class_names),
+                "weight": head.weight.detach().cpu(), "bias": head.bias.detach().cpu(), **metadata}
+    torch.save(artifact, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    logging.info(f"Linear head saved as {path} ({os.path.getsize(path) / 1e3:.1f} kB)")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fine-tune CLIP on the action frame dataset.")
     # Paths (use your own data path here)
-    train_dir = 'data/split/train'
-    val_dir = 'data/split/val'
+    parser.add_argument("--train-dir", default="data/split/train")
+    parser.add_argument("--val-dir", default="data/split/val")
+    parser.add_argument("--mode", choices=["finetune", "head", "compare"], default="finetune",
+                        help="finetune: train the whole model; head: train a linear head on frozen stock CLIP "
+                             "features; compare: both from stock CLIP, reporting accuracy and time")
+    parser.add_argument("--weights", default="fine_tuned_clip.pth", help="Loaded if present, saved after training")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--lr", type=float, default=1e-5)
+    parser.add_argument("--accumulation-steps", type=int, default=1,
+                        help="Batches per optimizer step (effective batch = batch size * this)")
+    parser.add_argument("--lr-schedule", choices=["constant", "cosine"], default="constant")
+    parser.add_argument("--warmup-steps", type=int, default=0, help="Optimizer steps of linear LR warmup")
+    parser.add_argument("--bf16", action="store_true", help="bf16 autocast for the forward passes (CPU or CUDA)")
+    parser.add_argument("--checkpoint", default="checkpoints/train_last.pt",
+                        help="Written after every --checkpoint-every epochs of --mode finetune; empty to disable")
+    parser.add_argument("--checkpoint-every", type=int, default=1)
+    parser.add_argument("--resume", action="store_true", help="Continue from --checkpoint if it exists")
+    parser.add_argument("--metrics-log", default="train_metrics.jsonl",
+                        help="One JSON line of loss, accuracy, throughput and memory per epoch")
+    parser.add_argument("--head-out", default="clip_head.pt", help="Where --mode head/compare writes the head")
+    parser.add_argument("--head-epochs", type=int, default=100)
+    parser.add_argument("--head-lr", type=float, default=1e-3)
+    parser.add_argument("--feature-cache", default="data/cache/features",
+                        help="Folder for the frozen image features of --mode head/compare")
+    parser.add_argument("--tensor-cache", default=None,
+                        help="Preprocess the frames once into memory-mapped tensors under this folder (e.g. data/cache)")
+    parser.add_argument("--cache-dtype", choices=["float16", "float32"], default="float16")
+    parser.add_argument("--workers", type=int, default=0, help="DataLoader worker processes")
+    parser.add_argument("--prefetch-factor", type=int, default=2, help="Batches loaded ahead per worker")
+    parser.add_argument("--pin-memory", action="store_true", help="Page-locked batches for faster GPU copies")
+    args = parser.parse_args()
+    train_dir = args.train_dir
+    val_dir = args.val_dir
 
     # Load CLIP model
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    model, preprocess = clip.load("ViT-B/32", device=device)
+    model, preprocess = clip.load(CLIP_BACKBONE, device=device)
     logging.info(f"Using device: {device}")
 
-    # Load existing weights to continue training
-    weights_path = "fine_tuned_clip.pth"
-    if os.path.exists(weights_path):
+    # Load existing weights to continue training (the head and the comparison start from stock CLIP)
+    weights_path = args.weights
+    if args.mode != "finetune":
+        logging.info("Starting from the stock CLIP weights.")
+    elif os.path.exists(weights_path):
         model.load_state_dict(torch.load(weights_path, map_location=device))
         logging.info(f"Loaded weights from {weights_path}")
     else:
@@ -132,21 +438,92 @@ if __name__ == "__main__":
     logging.info(f"Using {len(class_names)} classes: {class_names}")
 
     # Datasets and loaders
-    train_dataset = FrameDataset(train_dir, preprocess, class_names)
-    val_dataset = FrameDataset(val_dir, preprocess, class_names)
-    train_loader = DataLoader(train_dataset, batch_size=32, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=32, shuffle=False)
+    if args.tensor_cache:
+        train_dataset = cached_dataset(train_dir, os.path.join(args.tensor_cache, "train"), preprocess, class_names,
+                                       args.cache_dtype, args.workers)
+        val_dataset = cached_dataset(val_dir, os.path.join(args.tensor_cache, "val"), preprocess, class_names,
+                                     args.cache_dtype, args.workers)
+    else:
+        train_dataset = FrameDataset(train_dir, preprocess, class_names)
+        val_dataset = FrameDataset(val_dir, preprocess, class_names)
+    loader_options = {"num_workers": args.workers, "prefetch_factor": args.prefetch_factor, "pin_memory": args.pin_memory}
+    train_loader = make_loader(train_dataset, args.batch_size, shuffle=True, **loader_options)
+    val_loader = make_loader(val_dataset, args.batch_size, shuffle=False, **loader_options)
 
-    optimizer = torch.optim.Adam(model.parameters(), lr=1e-5)
-    loss_fn = torch.nn.CrossEntropyLoss()
+    # (method, validation accuracy, wall seconds, artifact bytes)
+    results = []
+    if args.mode in ("head", "compare"):
+        start = time.perf_counter()
+        train_features, train_labels = cached_features(
+            model, train_dataset, train_loader, os.path.join(args.feature_cache, "train.pt"), device)
+        val_features, val_labels = cached_features(
+            model, val_dataset, val_loader, os.path.join(args.feature_cache, "val.pt"), device)
+        encode_seconds = time.perf_counter() - start
+        head, head_val_accuracy = train_linear_head(
+            train_features, train_labels, val_features, val_labels, zero_shot_weights(model, class_names, device),
+            epochs=args.head_epochs, lr=args.head_lr)
+        head_seconds = time.perf_counter() - start
+        logging.info(f"Linear head: {encode_seconds:.1f}s for features, {head_seconds - encode_seconds:.1f}s for training")
+        save_head(head, args.head_out, class_names, val_accuracy=head_val_accuracy)
+        results.append(("linear head", head_val_accuracy, head_seconds, os.path.getsize(args.head_out)))
 
-    # Training loop
-    epochs = 1
-    for epoch in range(epochs):
-        logging.info(f"\nEpoch {epoch + 1}/{epochs}")
-        train_loss = train_clip(model, train_loader, optimizer, loss_fn, device, class_names)
-        val_loss, val_accuracy = validate_clip(model, val_loader, loss_fn, device, class_names)
+    if args.mode in ("finetune", "compare"):
+        optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+        loss_fn = torch.nn.CrossEntropyLoss()
+        epochs = args.epochs
+        steps_per_epoch = math.ceil(len(train_loader) / args.accumulation_steps)
+        scheduler = make_scheduler(optimizer, epochs * steps_per_epoch, args.warmup_steps, args.lr_schedule)
+        # The comparison always starts from stock CLIP, so it neither resumes nor checkpoints
+        checkpoint_path = args.checkpoint if args.mode == "finetune" else ""
+        start_epoch = 0
+        if args.resume and checkpoint_path and os.path.exists(checkpoint_path):
+            start_epoch = load_checkpoint(checkpoint_path, model, optimizer, scheduler, class_names, device)
+        if args.bf16:
+            logging.info("Using bf16 autocast.")
+
+        # Training loop
+        start = time.perf_counter()
+        val_accuracy = None
+        for epoch in range(start_epoch, epochs):
+            logging.info(f"\nEpoch {epoch + 1}/{epochs}")
+            if torch.device(device).type == "cuda":
+                torch.cuda.reset_peak_memory_stats()
+            epoch_start = time.perf_counter()
+            train_loss = train_clip(model, train_loader, optimizer, loss_fn, device, class_names,
+                                    scheduler, args.accumulation_steps, args.bf16)
+            train_seconds = time.perf_counter() - epoch_start
+            val_loss, val_accuracy = validate_clip(model, val_loader, loss_fn, device, class_names, args.bf16)
+            if checkpoint_path and ((epoch + 1) % args.checkpoint_every == 0 or epoch + 1 == epochs):
+                save_checkpoint(checkpoint_path, model, optimizer, scheduler, epoch + 1, class_names)
+            if args.metrics_log:
+                append_metrics(args.metrics_log, {
+                    "mode": args.mode,
+                    "epoch": epoch + 1,
+                    "train_loss": round(train_loss, 5),
+                    "val_loss": round(val_loss, 5),
+                    "val_accuracy": round(val_accuracy, 5),
+                    "lr": scheduler.get_last_lr()[0],
+                    "effective_batch_size": args.batch_size * args.accumulation_steps,
+                    "bf16": args.bf16,
+                    "train_images_per_sec": round(len(train_loader.dataset) / train_seconds, 2),
+                    "epoch_seconds": round(time.perf_counter() - epoch_start, 2),
+                    **memory_metrics(device),
+                })
+        finetune_seconds = time.perf_counter() - start
+        if val_accuracy is None:
+            # Resumed from a checkpoint that already finished every epoch
+            val_loss, val_accuracy = validate_clip(model, val_loader, loss_fn, device, class_names, args.bf16)
+
+        if args.mode == "finetune":
+            # Save weights back to same file, atomically so an interrupted save keeps the old weights
+            torch.save(model.state_dict(), f"{weights_path}.tmp")
+            os.replace(f"{weights_path}.tmp", weights_path)
+            logging.info(f"Model saved as {weights_path}")
+            weights_bytes = os.path.getsize(weights_path)
+        else:
+            # The comparison only measures the fine-tune; the existing weights file is left alone
+            weights_bytes = sum(t.numel() * t.element_size() for t in model.state_dict().values())
+        results.append((f"full fine-tune ({epochs} epochs)", val_accuracy, finetune_seconds, weights_bytes))
 
-    # Save weights back to same file
-    torch.save(model.state_dict(), weights_path)
-    logging.info(f"Model saved as {weights_path}")
+    for method, accuracy, seconds, size in results:
+        logging.info(f"{method}: val accuracy {accuracy:.4f}, {seconds:.1f}s wall time, {size / 1e6:.2f} MB artifact")
@@ -0,0 +1,67 @@
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+# The app runs from the api folder (flat imports, paths such as ../fine_tuned_clip.pth)
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+sys.path.insert(0, API_DIR)
+os.chdir(API_DIR)
+
+# Configuration is read at import time, so it is set before any app module is imported
+DATA_DIR = tempfile.mkdtemp(prefix="api-tests-")
+os.environ["LLM_BACKEND"] = "fake"
+os.environ["ANALYSIS_DB_PATH"] = os.path.join(DATA_DIR, "analysis.sqlite3")
+os.environ["ANALYSIS_CACHE_PATH"] = os.path.join(DATA_DIR, "analysis_cache.sqlite3")
+os.environ["TEXT_EMBEDDING_CACHE_DIR"] = ""
+os.environ["UPSTREAM_DELAY"] = "0"
+
+USER_ID = "user_test"
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from api import app
+    from clerk_auth import get_current_user_id
+    import llm_gateway
+
+    app.dependency_overrides[get_current_user_id] = lambda: USER_ID
+    llm_gateway.response_cache.invalidate()
+    with TestClient(app) as test_client:
+        yield test_client
+    app.dependency_overrides.clear()
+
+@pytest.fixture(scope="session")
+def upstream_url():
+    """dev_upstreams served on a local port; calls and faults are reset for every test using it."""
+    import uvicorn
+    import dev_upstreams
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(dev_upstreams.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+@pytest.fixture(autouse=True)
+def reset_upstream():
+    import dev_upstreams
+
+    for name in dev_upstreams.calls:
+        dev_upstreams.calls[name] = 0
+    dev_upstreams.faults.update(times=0, status=None, retry_after=None, delay=0.0)
+
+def inject(upstream_url, **fault):
+    import httpx
+
+    httpx.post(f"{upstream_url}/_faults", json=fault).raise_for_status()
@@ -0,0 +1,78 @@
+"""Verified-token cache and JWKS key rotation in clerk_auth."""
+import json
+import os
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import clerk_auth
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+def new_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+def make_token(private_key, kid=None, sub="user_1", expires_in=3600):
+    headers = {"kid": kid} if kid else None
+    return jwt.encode({"sub": sub, "exp": int(time.time()) + expires_in}, private_key, algorithm="RS256", headers=headers)
+
+def write_jwks(path, keys):
+    jwks = {"keys": [{**json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key())), "kid": kid, "alg": "RS256"}
+                     for kid, key in keys.items()]}
+    with open(path, "w") as f:
+        json.dump(jwks, f)
+    # Rotations within the same mtime tick would go unnoticed; move the mtime on explicitly
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+@pytest.fixture
+def auth(tmp_path, monkeypatch):
+    """clerk_auth with a fresh token cache and a JWKS file that is checked on every request."""
+    cache = clerk_auth.VerifiedTokenCache(max_entries=16, clock=FakeClock())
+    path = tmp_path / "jwks.json"
+    keys = {"old": new_key()}
+    write_jwks(path, keys)
+    monkeypatch.setattr(clerk_auth, "token_cache", cache)
+    monkeypatch.setattr(clerk_auth, "jwks", clerk_auth.JWKSFile(str(path), reload_seconds=0, on_reload=cache.clear))
+    monkeypatch.setattr(clerk_auth, "public_key", None)
+    return cache, path, keys
+
+def test_repeated_token_is_a_cache_hit(auth):
+    cache, _, keys = auth
+    token = make_token(keys["old"], "old")
+    assert clerk_auth.verify_token(token) == "user_1"
+    assert clerk_auth.verify_token(token) == "user_1"
+    assert cache.stats == {"hits": 1, "misses": 1}
+
+def test_cached_token_expires(auth):
+    cache, _, keys = auth
+    token = make_token(keys["old"], "old", expires_in=60)
+    clerk_auth.verify_token(token)
+    cache.clock.now += 120
+    assert cache.get(token) is None
+    # Past the JWT leeway the token itself is rejected too, not just dropped from the cache
+    with pytest.raises(jwt.ExpiredSignatureError):
+        clerk_auth.verify_token(make_token(keys["old"], "old", expires_in=-60))
+
+def test_rotated_out_key_is_not_trusted_from_the_cache(auth):
+    cache, path, keys = auth
+    token = make_token(keys["old"], "old")
+    assert clerk_auth.verify_token(token) == "user_1"
+
+    write_jwks(path, {"new": new_key()})
+    with pytest.raises(jwt.InvalidKeyError):
+        clerk_auth.verify_token(token)
+    assert cache.stats["hits"] == 0
+
+def test_tokens_of_the_new_key_verify_after_rotation(auth):
+    _, path, _ = auth
+    new = new_key()
+    write_jwks(path, {"new": new})
+    assert clerk_auth.verify_token(make_token(new, "new", sub="user_2")) == "user_2"
@@ -0,0 +1,107 @@
+"""/ai-news and /analyze end to end with LLM_BACKEND=fake; CLIP, Whisper and Shazam are replaced."""
+import json
+import os
+
+import pytest
+
+import analyzeapi
+import dev_upstreams
+import llm_gateway
+from ainewsapi import FALLBACK_REPLY
+
+def sse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_ai_news_returns_ideas(client):
+    response = client.post("/ai-news", json={"question": "space"})
+    assert response.status_code == 200
+    reply = response.json()["reply"]
+    assert len(reply) == 3
+    assert reply[0]["title"] == "You Won't Believe Idea #1!"
+
+def test_ai_news_caches_valid_replies(client):
+    first = client.post("/ai-news", json={"question": "cats"}).json()
+    assert client.post("/ai-news", json={"question": "CATS"}).json() == first
+    assert llm_gateway.metrics["ai_news"]["cache_hits"] >= 1
+
+def test_ai_news_does_not_cache_malformed_replies(client, monkeypatch):
+    monkeypatch.setattr(dev_upstreams, "fake_reply", lambda prompt: "Sorry, I can't help with that.")
+    assert client.post("/ai-news", json={"question": "dogs"}).json()["reply"] == FALLBACK_REPLY
+    monkeypatch.undo()
+    # The bad reply was not kept, so the next request asks again and gets real ideas
+    reply = client.post("/ai-news", json={"question": "dogs"}).json()["reply"]
+    assert reply != FALLBACK_REPLY
+
+def test_ai_news_stream(client):
+    response = client.post("/ai-news?stream=true", json={"question": "robots"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response.text)
+    assert [name for name, _ in events] == ["idea", "idea", "idea", "done"]
+    assert events[-1][1] == {"count": 3}
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """Stand-ins for the model stages, which need torch, Whisper and ffmpeg."""
+    calls = {"visual": 0}
+
+    def classify_video(video_path, *args):
+        calls["visual"] += 1
+        return {"predicted_action": "yoga", "frame_count": 4, "sampled_frames": 12, "stopped_early": True,
+                "top_actions": [{"action": "yoga", "confidence": 0.8}],
+                "keyframes": {"sampled": 12, "classified": 4}}
+
+    monkeypatch.setattr(analyzeapi, "classify_video", classify_video)
+    monkeypatch.setattr(analyzeapi, "get_video_length", lambda video_path: 12.5)
+    monkeypatch.setattr(analyzeapi, "extract_audio", lambda video_path, audio_path: None)
+    monkeypatch.setattr(analyzeapi, "transcribe", lambda audio_path: "hello world")
+
+    async def recognize_music(audio_path):
+        return None
+
+    monkeypatch.setattr(analyzeapi, "recognize_music", recognize_music)
+    return calls
+
+def upload(content=b"fake video bytes"):
+    return {"video": ("clip.mp4", content, "video/mp4")}
+
+def test_analyze(client, fake_pipeline):
+    response = client.post("/analyze", files=upload(os.urandom(64)))
+    assert response.status_code == 200
+    body = response.json()
+    assert body["score"] == 72
+    assert body["predicted_action"] == "yoga"
+    assert body["keyframes"] == {"sampled": 12, "classified": 4}
+    assert body["cached_stages"] == []
+
+    history = client.get("/analyze/history").json()
+    assert body["id"] in [analysis["id"] for analysis in history]
+
+def test_analyze_cache_hit_has_the_same_shape(client, fake_pipeline):
+    content = os.urandom(64)
+    first = client.post("/analyze", files=upload(content)).json()
+    second = client.post("/analyze", files=upload(content)).json()
+    assert fake_pipeline["visual"] == 1
+    assert second["cached_stages"] == ["music", "transcription", "video_length", "visual"]
+    for field in ("predicted_action", "top_actions", "keyframes", "transcription", "music_info"):
+        assert second[field] == first[field]
+
+def test_analyze_stream(client, fake_pipeline):
+    response = client.post("/analyze?stream=true", files=upload(os.urandom(64)))
+    events = sse_events(response.text)
+    assert events[0] == ("started", {"video_filename": "clip.mp4"})
+    assert {name for name, _ in events[1:-1]} == {"token"}
+    name, result = events[-1]
+    assert name == "result"
+    assert result["score"] == 72
+
+@pytest.mark.parametrize("params", [
+    {"frame_interval": 0}, {"frame_interval": -5}, {"sample_fps": 0}, {"sample_fps": -1}, {"num_frames": 0},
+])
+def test_analyze_rejects_sampling_that_decodes_every_frame(client, fake_pipeline, params):
+    response = client.post("/analyze", params=params, files=upload())
+    assert response.status_code == 422
+    assert fake_pipeline["visual"] == 0
@@ -0,0 +1,33 @@
+"""The stage-cache key of visual results follows every setting that changes the probabilities."""
+import pytest
+
+import analyzeapi
+import clip_inference
+
+@pytest.fixture
+def key(monkeypatch):
+    def key_with(**settings):
+        for name, value in settings.items():
+            monkeypatch.setattr(clip_inference, name, value)
+        if "CLIP_BATCH_SIZE" in settings:
+            monkeypatch.setattr(analyzeapi, "CLIP_BATCH_SIZE", settings["CLIP_BATCH_SIZE"])
+        clip_inference.clip_model_identity.cache_clear()
+        return analyzeapi.frame_sampling_key(30, None, None)
+
+    yield key_with
+    clip_inference.clip_model_identity.cache_clear()
+
+def test_precision_is_part_of_the_key(key):
+    keys = {precision: key(CLIP_PRECISION=precision) for precision in ("fp32", "bf16", "int8")}
+    assert len(set(keys.values())) == 3
+    assert "precision=bf16" in keys["bf16"]
+
+def test_batch_size_is_part_of_the_key(key):
+    assert key(CLIP_BATCH_SIZE=8) != key(CLIP_BATCH_SIZE=32)
+
+def test_weights_are_part_of_the_key(key, tmp_path):
+    head = tmp_path / "clip_head.pt"
+    head.write_bytes(b"a")
+    first = key(CLIP_HEAD_PATH=str(head))
+    head.write_bytes(b"retrained")
+    assert key(CLIP_HEAD_PATH=str(head)) != first
@@ -0,0 +1,38 @@
+"""GET /analyze/history pagination."""
+import base64
+import json
+
+import pytest
+
+from analyze_db import insert_analysis
+from conftest import USER_ID
+
+def cursor_of(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+def test_same_day_analyses_come_newest_first(client):
+    # Random UUIDs would sort in any order; insertion order must win within a day
+    ids = ["c-first", "a-second", "b-third"]
+    for analysis_id in ids:
+        insert_analysis(analysis_id, USER_ID, "Analysis", "2099-01-01", "x", "clip.mp4", 50)
+
+    seen = []
+    cursor = None
+    while len(seen) < len(ids):
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/analyze/history", params=params)
+        seen += [analysis["id"] for analysis in response.json()]
+        cursor = response.headers["X-Next-Cursor"]
+    assert seen == ids[::-1]
+
+@pytest.mark.parametrize("cursor", [
+    cursor_of([{}, {}]),
+    cursor_of(["2025-06-01", "1"]),
+    cursor_of(["not a date", 1]),
+    cursor_of([20250601, 1]),
+    cursor_of(["2025-06-01"]),
+    "not base64!",
+])
+def test_malformed_cursor_is_rejected(client, cursor):
+    response = client.get("/analyze/history", params={"limit": 2, "cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,69 @@
+"""request_with_retries against the dev_upstreams stand-in, served over a real socket."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import dev_upstreams
+import http_client
+from conftest import inject
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_BACKOFF", 0.01)
+
+def get_headlines(upstream_url, **kwargs):
+    async def run():
+        try:
+            return await http_client.request_with_retries("GET", f"{upstream_url}/v2/top-headlines", **kwargs)
+        finally:
+            # The shared client belongs to this event loop
+            await http_client.close_http_client()
+    return asyncio.run(run())
+
+def test_retries_server_errors(upstream_url):
+    inject(upstream_url, times=2, status=503)
+    response = get_headlines(upstream_url, retries=2)
+    assert response.status_code == 200
+    assert dev_upstreams.calls["top-headlines"] == 3
+
+def test_returns_last_response_when_retries_run_out(upstream_url):
+    inject(upstream_url, times=5, status=502)
+    response = get_headlines(upstream_url, retries=2)
+    assert response.status_code == 502
+    assert dev_upstreams.calls["top-headlines"] == 3
+
+def test_does_not_retry_client_errors(upstream_url):
+    inject(upstream_url, times=1, status=404)
+    assert get_headlines(upstream_url, retries=2).status_code == 404
+    assert dev_upstreams.calls["top-headlines"] == 1
+
+def test_waits_for_retry_after_on_429(upstream_url):
+    inject(upstream_url, times=1, status=429, retry_after="1")
+    start = time.perf_counter()
+    response = get_headlines(upstream_url, retries=1)
+    assert response.status_code == 200
+    assert time.perf_counter() - start >= 1
+    assert dev_upstreams.calls["top-headlines"] == 2
+
+def test_returns_429_when_retry_after_exceeds_the_cap(upstream_url):
+    inject(upstream_url, times=1, status=429, retry_after="3600")
+    start = time.perf_counter()
+    response = get_headlines(upstream_url, retries=2)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3600"
+    assert time.perf_counter() - start < 1
+    assert dev_upstreams.calls["top-headlines"] == 1
+
+def test_retries_timeouts(upstream_url):
+    inject(upstream_url, times=1, delay=1.0)
+    response = get_headlines(upstream_url, retries=1, timeout=0.2)
+    assert response.status_code == 200
+    assert dev_upstreams.calls["top-headlines"] == 2
+
+def test_raises_the_timeout_when_retries_run_out(upstream_url):
+    inject(upstream_url, times=2, delay=1.0)
+    with pytest.raises(httpx.ReadTimeout):
+        get_headlines(upstream_url, retries=1, timeout=0.2)
+    assert dev_upstreams.calls["top-headlines"] == 2
@@ -0,0 +1,83 @@
+"""Single-flight and stale-while-revalidate of the news cache behind /trends and /trend-growth."""
+import asyncio
+
+import httpx
+import pytest
+
+import dev_upstreams
+import http_client
+import trendsapi
+from conftest import USER_ID, inject
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def news_cache(upstream_url, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(trendsapi, "NEWSAPI_BASE_URL", upstream_url)
+    monkeypatch.setattr(trendsapi.news_cache, "clock", clock)
+    trendsapi.news_cache.invalidate()
+    trendsapi.news_cache.stats.update(hits=0, stale_hits=0, misses=0, loads=0, errors=0)
+    yield trendsapi.news_cache, clock
+    trendsapi.news_cache.invalidate()
+
+def run_app(requests):
+    """Send (path, params) requests to the app at the same time and return the responses."""
+    from api import app
+    from clerk_auth import get_current_user_id
+
+    async def run():
+        app.dependency_overrides[get_current_user_id] = lambda: USER_ID
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+                responses = await asyncio.gather(*(client.get(path, params=params) for path, params in requests))
+                # Let background refreshes finish on this event loop
+                while trendsapi.news_cache._inflight:
+                    await asyncio.sleep(0.01)
+                return responses
+        finally:
+            app.dependency_overrides.clear()
+            await http_client.close_http_client()
+    return asyncio.run(run())
+
+def test_concurrent_cold_requests_share_one_upstream_call(news_cache, upstream_url):
+    cache, _ = news_cache
+    # Keep the first fetch in flight long enough for every request to arrive
+    inject(upstream_url, times=1, delay=0.3)
+    requests = [("/trends", {})] * 5 + [("/trend-growth", {"id": i, "days": 5}) for i in range(1, 6)]
+    responses = run_app(requests)
+
+    assert [response.status_code for response in responses] == [200] * len(requests)
+    assert dev_upstreams.calls["top-headlines"] == 1
+    assert len({response.text for response in responses[:5]}) == 1
+    # One load for the headlines, one for the categorized /trends result
+    assert cache.stats["loads"] == 2
+
+def test_expired_entry_is_served_stale_during_one_refresh(news_cache, upstream_url):
+    cache, clock = news_cache
+    first = run_app([("/trend-growth", {"id": 1, "days": 5})])[0]
+    assert dev_upstreams.calls["top-headlines"] == 1
+    loaded_at = cache._entries["headlines"][1]
+
+    # Past the TTL but within the stale window
+    clock.now += trendsapi.NEWS_CACHE_TTL + 1
+    inject(upstream_url, times=1, delay=0.3)
+    responses = run_app([("/trend-growth", {"id": 1, "days": 5})] * 5)
+
+    assert [response.json() for response in responses] == [first.json()] * 5
+    assert cache.stats["stale_hits"] == 5
+    assert dev_upstreams.calls["top-headlines"] == 2
+    assert cache._entries["headlines"][1] == clock.now > loaded_at
+
+def test_entry_past_the_stale_window_is_loaded_again(news_cache, upstream_url):
+    cache, clock = news_cache
+    run_app([("/trend-growth", {"id": 1, "days": 5})])
+    clock.now += trendsapi.NEWS_CACHE_TTL + trendsapi.NEWS_STALE_TTL + 1
+    run_app([("/trend-growth", {"id": 1, "days": 5})] * 3)
+    assert cache.stats["stale_hits"] == 0
+    assert dev_upstreams.calls["top-headlines"] == 2